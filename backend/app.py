@@ -1,19 +1,33 @@
 import os
-from flask import Flask
+import click
+from flask import Flask, jsonify
 from dotenv import load_dotenv
 from flask_cors import CORS
 from extensions import db, jwt, mail
+from jobs import jobs
+from ratelimit import limiter
+from events import events
+from metrics import init_metrics, TimedQueuePool
+from decorators import load_user
 from config import Config
+from migrations import upgrade
 
 load_dotenv()
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    if 'pool_size' in app.config['SQLALCHEMY_ENGINE_OPTIONS']:
+        # Same QueuePool, plus checkout wait times for /metrics
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {**app.config['SQLALCHEMY_ENGINE_OPTIONS'], 'poolclass': TimedQueuePool}
 
     db.init_app(app)
     jwt.init_app(app)
     mail.init_app(app)
+    jobs.init_app(app)
+    limiter.init_app(app)
+    events.init_app(app)
+    init_metrics(app)
     CORS(app)
 
     
@@ -24,6 +38,19 @@ def create_app():
             return str(user_identity.get("id"))
         return str(user_identity)
 
+    @jwt.token_verification_loader
+    def reject_scoped_tokens(jwt_header, jwt_data):
+        # Password-reset and upload tokens are single-purpose; they must not work as session tokens
+        return jwt_data.get("type") in ("access", "refresh")
+
+    @jwt.user_lookup_loader
+    def lookup_user(jwt_header, jwt_data):
+        return load_user(jwt_data["sub"])
+
+    @jwt.user_lookup_error_loader
+    def user_not_found(jwt_header, jwt_data):
+        return jsonify(message="User no longer exists"), 401
+
     @jwt.additional_claims_loader
     def add_claims_to_access_token(user_identity):
         if isinstance(user_identity, dict):
@@ -35,12 +62,40 @@ def create_app():
 
         from routes import routes_bp
         from auth import auth_bp
+        import tasks  # registers background job handlers
         
         app.register_blueprint(routes_bp)
         app.register_blueprint(auth_bp)
-        
 
-        db.create_all()
+    # Schema changes are a deploy step, run once per release rather than by every worker on boot
+    @app.cli.command('db-upgrade')
+    def db_upgrade():
+        """Creates missing tables, columns and indexes."""
+        upgrade()
+        print("Schema is up to date.")
+
+    @app.cli.command('expiry-reminders')
+    def expiry_reminders():
+        """Queues reminder emails for certificates entering an expiry window."""
+        from expiry import send_expiry_reminders
+        result = send_expiry_reminders()
+        jobs.join()
+        print(f"{result['items']} reminders queued in {result['emails']} emails.")
+
+    @app.cli.command('reports-rebuild')
+    def reports_rebuild():
+        """Recomputes the reporting summary table from the certificates table."""
+        from reports import rebuild_summary
+        print(f"{rebuild_summary()} summary rows written.")
+
+    @app.cli.command('derivatives-backfill')
+    @click.option('--limit', default=1000, help='Uploads to process in this run.')
+    def derivatives_backfill(limit):
+        """Generates thumbnails and text for uploads that have none yet."""
+        from derivatives import missing_derivatives, generate_derivatives
+        upload_ids = missing_derivatives(limit)
+        generate_derivatives(upload_ids)
+        print(f"Processed {len(upload_ids)} uploads.")
 
     return app
 
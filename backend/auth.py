@@ -3,6 +3,9 @@ from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identi
 from models import db, User
 from extensions import db
 from datetime import timedelta
+from etags import conditional, MANAGERS_CACHE_CONTROL
+from ratelimit import limiter, client_ip, submitted_email
+from routes import invalidate_stats
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
@@ -42,6 +45,8 @@ def register_user():
         
         db.session.add(new_user)
         db.session.commit()
+        # The new account counts towards the admin's and its managers' team_size
+        invalidate_stats(new_user.id)
         return jsonify(message="Employee registered successfully"), 201
     
     except Exception as e:
@@ -50,6 +55,8 @@ def register_user():
 
 
 @auth_bp.route('/login', methods=['POST'])
+@limiter.limit('LOGIN_RATE_LIMIT', client_ip)
+@limiter.limit_failures('LOGIN_ACCOUNT_RATE_LIMIT', submitted_email)
 def login():
     data = request.get_json()
     if not data: return jsonify(message="Missing JSON"), 400
@@ -57,6 +64,11 @@ def login():
     user = User.query.filter_by(email=data.get('email')).first()
     
     if user and user.check_password(data.get('password')):
+        if user.needs_rehash():
+            # Upgrade the hash to the current cost while we hold the plaintext
+            user.set_password(data.get('password'))
+            db.session.commit()
+
         # identity dict must match what your role_required decorator expects
         identity = {'id': user.id, 'role': user.role}
         token = create_access_token(identity=identity, expires_delta=timedelta(hours=24))
@@ -74,6 +86,7 @@ def login():
 
 
 @auth_bp.route('/managers', methods=['GET'])
+@conditional('users', per_user=False, cache_control=MANAGERS_CACHE_CONTROL)
 def get_managers():
     """
     Public endpoint to populate the 'Report To' dropdown in Registration.
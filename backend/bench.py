@@ -0,0 +1,292 @@
+"""
+Load-test / micro-benchmark harness for the CertFlow API.
+
+Builds the real app from create_app() against SQLite (default, a throwaway file)
+or any DATABASE_URL such as Postgres, seeds a synthetic org chart, then drives the
+hot endpoints through Flask's test client from several threads. Storage runs on
+the in-memory backend so uploads measure our code, not the network.
+
+    python bench.py --certificates 100000 --output results.json
+    python bench.py --database-url postgresql://localhost/certflow_bench --certificates 1000000
+    python bench.py --scenarios none --startup-runs 10   # boot time only, nothing seeded
+
+--database-url gets migrated and filled with synthetic users and certificates:
+point it at a throwaway database, never production.
+
+Results are JSON so two commits can be compared with any diff/plot tool.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument('--database-url',
+                        help="a throwaway database, never production (it is seeded); defaults to a temporary SQLite file")
+    parser.add_argument('--certificates', type=int, default=10000)
+    parser.add_argument('--directors', type=int, default=5)
+    parser.add_argument('--managers-per-director', type=int, default=4)
+    parser.add_argument('--employees-per-manager', type=int, default=10)
+    parser.add_argument('--requests', type=int, default=200, help="requests per scenario")
+    parser.add_argument('--concurrency', type=int, default=4, help="client threads per scenario")
+    parser.add_argument('--scenarios', help="comma-separated subset of scenarios to run ('none' skips seeding too)")
+    parser.add_argument('--startup-runs', type=int, default=5,
+                        help="fresh processes timed for import and first-request latency (0 skips)")
+    parser.add_argument('--output', help="write JSON results here instead of stdout")
+    return parser.parse_args()
+
+
+def configure_environment(args):
+    # Config reads the environment at import time, so this must run before importing the app
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        fd, path = tempfile.mkstemp(suffix='.db', prefix='certflow-bench-')
+        os.close(fd)
+        os.environ['DATABASE_URL'] = f"sqlite:///{path}"
+    os.environ['STORAGE_BACKEND'] = 'memory'
+    # The login scenario measures hashing cost, not the limiter's rejections
+    os.environ['RATELIMIT_ENABLED'] = 'false'
+    os.environ.setdefault('JWT_SECRET_KEY', 'bench-only-secret-key-not-for-production')
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def run_scenario(app, make_request, total, concurrency):
+    """Runs make_request(client, rng) `total` times across `concurrency` threads"""
+    latencies, errors = [], []
+    lock = threading.Lock()
+    per_thread = [total // concurrency + (1 if i < total % concurrency else 0) for i in range(concurrency)]
+
+    def worker(n, seed):
+        client, rng = app.test_client(), random.Random(seed)
+        local, failed = [], 0
+        for _ in range(n):
+            start = time.perf_counter()
+            status = make_request(client, rng)
+            local.append(time.perf_counter() - start)
+            if status >= 400:
+                failed += 1
+        with lock:
+            latencies.extend(local)
+            errors.append(failed)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(n, i)) for i, n in enumerate(per_thread)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    ms = lambda v: round(v * 1000, 3) if v is not None else None
+    return {
+        "requests": len(latencies),
+        "errors": sum(errors),
+        "p50_ms": ms(percentile(latencies, 0.50)),
+        "p99_ms": ms(percentile(latencies, 0.99)),
+        "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else None,
+        "throughput_rps": round(len(latencies) / wall, 1) if wall else None,
+    }
+
+
+def build_scenarios(app, ids, password):
+    from flask_jwt_extended import create_access_token
+    from models import Certificate, User
+    from hierarchy import team_ids
+    from extensions import db
+    from sqlalchemy import select
+
+    with app.app_context():
+        def token(user_id, role):
+            return {"Authorization": f"Bearer {create_access_token(identity={'id': user_id, 'role': role})}"}
+
+        admin = token(ids['admin'][0], 'admin')
+        managers = [(m, token(m, 'manager')) for m in ids['manager']]
+        employees = [token(e, 'employee') for e in ids['employee']]
+        # Certificates each manager may act on, for the status-update scenario
+        reviewable = {m: list(db.session.scalars(
+            select(Certificate.id).where(Certificate.user_id.in_(team_ids(m, include_self=False))).limit(200)
+        )) for m, _ in managers}
+        emails = list(db.session.scalars(select(User.email).where(User.id.in_(ids['employee']))))
+        deep_cursor = app.test_client().get(
+            '/api/certificates/all', query_string={'limit': 500}, headers=admin).json['next_cursor']
+
+    def login(client, rng):
+        return client.post('/api/auth/login', json={"email": rng.choice(emails), "password": password}).status_code
+
+    def stats_employee(client, rng):
+        return client.get('/api/dashboard/stats', headers=rng.choice(employees)).status_code
+
+    def stats_manager_uncached(client, rng):
+        from routes import stats_cache
+        stats_cache.clear()
+        return client.get('/api/dashboard/stats', headers=rng.choice(managers)[1]).status_code
+
+    def stats_admin(client, rng):
+        return client.get('/api/dashboard/stats', headers=admin).status_code
+
+    def list_first_page_admin(client, rng):
+        return client.get('/api/certificates/all', headers=admin).status_code
+
+    def list_deep_page_admin(client, rng):
+        return client.get('/api/certificates/all', query_string={'cursor': deep_cursor}, headers=admin).status_code
+
+    def list_manager_filtered(client, rng):
+        return client.get('/api/certificates/all', query_string={'status': 'pending', 'count': 'true'},
+                          headers=rng.choice(managers)[1]).status_code
+
+    def upload(client, rng):
+        import io
+        data = {"title": "Bench upload", "client": "NIC",
+                "file": (io.BytesIO(b"%PDF-1.4\n" + os.urandom(64 * 1024)), "bench.pdf")}
+        return client.post('/api/certificates', data=data, headers=rng.choice(employees),
+                           content_type='multipart/form-data').status_code
+
+    def update_status(client, rng):
+        manager, headers = rng.choice(managers)
+        if not reviewable[manager]:
+            return 200
+        cert_id = rng.choice(reviewable[manager])
+        return client.patch(f'/api/certificates/{cert_id}/status',
+                            json={"status": rng.choice(['approved', 'rejected'])}, headers=headers).status_code
+
+    return {
+        "login": login,
+        "stats_employee": stats_employee,
+        "stats_manager_uncached": stats_manager_uncached,
+        "stats_admin": stats_admin,
+        "list_first_page_admin": list_first_page_admin,
+        "list_deep_page_admin": list_deep_page_admin,
+        "list_manager_filtered": list_manager_filtered,
+        "upload": upload,
+        "update_status": update_status,
+    }
+
+
+# Runs in a fresh interpreter so module imports are cold, like a newly forked worker
+STARTUP_PROBE = """
+import json, time
+started = time.perf_counter()
+import app as app_module
+imported = time.perf_counter()
+application = app_module.create_app()
+created = time.perf_counter()
+response = application.test_client().get('/api/auth/managers')
+answered = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "create_app_ms": (created - imported) * 1000,
+    "first_request_ms": (answered - created) * 1000,
+    "status": response.status_code,
+}))
+"""
+
+def measure_startup(runs):
+    """Import, create_app() and first-request latency of `runs` cold processes (p50 and max)"""
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        out = subprocess.run([sys.executable, '-c', STARTUP_PROBE], cwd=os.path.dirname(os.path.abspath(__file__)),
+                             env=os.environ, capture_output=True, text=True, check=True).stdout
+        sample = json.loads(out.strip().splitlines()[-1])
+        if sample.pop("status") != 200:
+            raise RuntimeError("First request after startup did not succeed")
+        sample["process_ms"] = (time.perf_counter() - started) * 1000
+        samples.append(sample)
+
+    report = {}
+    for key in ("import_ms", "create_app_ms", "first_request_ms", "process_ms"):
+        values = sorted(s[key] for s in samples)
+        report[key] = {"p50": round(percentile(values, 0.5), 1), "max": round(values[-1], 1)}
+    return report
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def main():
+    args = parse_args()
+    configure_environment(args)
+
+    from app import create_app
+    from seed import seed_synthetic
+    from migrations import upgrade
+
+    wanted = [name for name in args.scenarios.split(',') if name and name != 'none'] if args.scenarios else None
+    if args.database_url and wanted != []:
+        print("warning: seeding synthetic users and certificates into --database-url; "
+              "never point it at a production database", file=sys.stderr)
+
+    password = "bench-password"
+    app = create_app()
+    seed_started = time.perf_counter()
+    with app.app_context():
+        # The startup probe's first request needs the tables, even when nothing is seeded
+        upgrade()
+        ids = {}
+        if wanted != []:
+            ids = seed_synthetic(
+                directors=args.directors,
+                managers_per_director=args.managers_per_director,
+                employees_per_manager=args.employees_per_manager,
+                certificates=args.certificates,
+                password=password,
+            )
+    seed_seconds = time.perf_counter() - seed_started
+
+    scenarios = build_scenarios(app, ids, password) if ids else {}
+    if wanted:
+        scenarios = {name: fn for name, fn in scenarios.items() if name in wanted}
+
+    results = {}
+    for name, fn in scenarios.items():
+        results[name] = run_scenario(app, fn, args.requests, args.concurrency)
+        print(f"{name:<26} p50={results[name]['p50_ms']}ms p99={results[name]['p99_ms']}ms "
+              f"{results[name]['throughput_rps']} req/s", file=sys.stderr)
+
+    startup = measure_startup(args.startup_runs) if args.startup_runs else None
+    if startup:
+        print(f"{'startup':<26} import={startup['import_ms']['p50']}ms create_app={startup['create_app_ms']['p50']}ms "
+              f"first_request={startup['first_request_ms']['p50']}ms", file=sys.stderr)
+
+    report = {
+        "commit": git_commit(),
+        "run_at": datetime.utcnow().isoformat(),
+        "database": app.config['SQLALCHEMY_DATABASE_URI'].split('://', 1)[0],
+        "certificates": args.certificates if ids else 0,
+        "users": sum(len(v) for v in ids.values()),
+        "requests_per_scenario": args.requests,
+        "concurrency": args.concurrency,
+        "seed_seconds": round(seed_seconds, 2),
+        "startup": startup,
+        "scenarios": results,
+    }
+    body = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(body + "\n")
+    else:
+        print(body)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import hashlib
+import os
+from sqlalchemy import select, update, delete, insert
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from models import Blob, Upload, Certificate, TCILCertificate
+from storage import get_storage
+
+
+def hash_chunks(chunks):
+    """Returns (sha256 hex digest, size) of a chunk iterator"""
+    digest, size = hashlib.sha256(), 0
+    for chunk in chunks:
+        digest.update(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+def content_key(digest, filename):
+    # The digest leads, so LocalStorage shards content-addressed keys evenly
+    return f"{digest}{os.path.splitext(filename)[1].lower()}"
+
+
+def acquire(digest, size, key, write=None):
+    """
+    Takes one reference on the blob with this digest and returns its storage key.
+    If the content is new, write(key) stores it first (pass write=None when the
+    object already sits at `key`, e.g. after a presigned upload). Returns
+    (storage_key, is_new).
+    """
+    existing = _increment(digest, 1)
+    if existing is not None:
+        return existing, False
+    if write is not None:
+        write(key)
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(Blob).values(sha256=digest, storage_key=key, size=size, refcount=1))
+        return key, True
+    except IntegrityError:
+        # Another request stored the same content first; share its object instead
+        return _increment(digest, 1), False
+
+def acquire_many(counts, sizes, keys):
+    """
+    Bulk form of acquire() for content that has already been written: adds
+    counts[digest] references per digest, creating missing blob rows with `keys`.
+    """
+    for digest, n in counts.items():
+        if _increment(digest, n) is not None:
+            continue
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(Blob).values(sha256=digest, storage_key=keys[digest],
+                                                       size=sizes[digest], refcount=n))
+        except IntegrityError:
+            _increment(digest, n)
+
+def existing_keys(digests):
+    """Maps the digests already stored to their storage keys"""
+    return dict(db.session.execute(
+        select(Blob.sha256, Blob.storage_key).where(Blob.sha256.in_(digests))
+    ).all())
+
+def release(digest):
+    """Drops one reference; returns the storage key to delete if it was the last one"""
+    db.session.execute(update(Blob).where(Blob.sha256 == digest).values(refcount=Blob.refcount - 1))
+    key = db.session.scalar(
+        delete(Blob).where(Blob.sha256 == digest, Blob.refcount <= 0).returning(Blob.storage_key)
+    )
+    return key
+
+def is_referenced(key):
+    """True while a blob or an upload (including a pending one) still points at the object"""
+    if db.session.scalar(select(Blob.sha256).where(Blob.storage_key == key)) is not None:
+        return True
+    return db.session.scalar(select(Upload.id).where(Upload.storage_key == key).limit(1)) is not None
+
+def _increment(digest, n):
+    return db.session.scalar(
+        update(Blob).where(Blob.sha256 == digest).values(refcount=Blob.refcount + n).returning(Blob.storage_key)
+    )
+
+
+def dedupe_upload(upload_id):
+    """
+    Hashes a finalized direct upload where it is stored and takes its blob
+    reference. If the content was already stored, the upload (and the URL its
+    certificate keeps) is moved to the shared object and the fresh copy's key is
+    returned for deletion; otherwise returns None.
+    """
+    up = db.session.get(Upload, upload_id)
+    if up is None or up.status != 'complete' or up.sha256:
+        return None
+    storage = get_storage()
+    uploaded_key = up.storage_key
+    digest, size = hash_chunks(storage.stream(uploaded_key))
+    key, _ = acquire(digest, size, uploaded_key)
+    up.sha256 = digest
+    if key != uploaded_key:
+        url = storage.url(key)
+        db.session.execute(update(Certificate).where(Certificate.upload_id == up.id).values(filename=url))
+        db.session.execute(update(TCILCertificate).where(TCILCertificate.upload_id == up.id).values(pdf_path=url))
+        up.storage_key, up.filepath = key, url
+    db.session.commit()
+    return uploaded_key if key != uploaded_key else None
@@ -0,0 +1,178 @@
+import csv
+import io
+import json
+import os
+import zipfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from sqlalchemy import insert, select
+from extensions import db
+from models import Upload, Certificate, User
+from hierarchy import team_ids
+from jobs import jobs
+from reports import record_created
+from blobs import hash_chunks, content_key, existing_keys, acquire_many
+from storage import get_storage, iter_chunks
+from utils import allowed_file, certificate_values
+
+
+class ManifestError(Exception):
+    pass
+
+
+def read_manifest(file):
+    """Parses a CSV (header row) or JSON (list of objects) manifest into row dicts"""
+    raw = file.read()
+    try:
+        if file.filename.lower().endswith('.json'):
+            rows = json.loads(raw)
+            if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+                raise ManifestError("JSON manifest must be a list of objects")
+        else:
+            rows = list(csv.DictReader(io.StringIO(raw.decode('utf-8-sig'))))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ManifestError(f"Unreadable manifest: {e}")
+
+    max_rows = current_app.config['BULK_IMPORT_MAX_ROWS']
+    if len(rows) > max_rows:
+        raise ManifestError(f"Manifest has {len(rows)} rows; the limit is {max_rows}")
+    return [{k.strip(): (v.strip() if isinstance(v, str) else v) for k, v in r.items() if k} for r in rows]
+
+
+def _resolve_owners(rows, requester_id, role):
+    """Maps each row's optional owner_email to a user id the requester may import for"""
+    emails = {r['owner_email'] for r in rows if r.get('owner_email')}
+    if not emails:
+        return {}
+    stmt = select(User.email, User.id).where(User.email.in_(emails))
+    if role == 'manager':
+        stmt = stmt.where(User.id.in_(team_ids(requester_id)))
+    elif role != 'admin':
+        stmt = stmt.where(User.id == requester_id)
+    return dict(db.session.execute(stmt).all())
+
+
+def import_certificates(manifest_file, archive_file, requester_id, role):
+    """
+    Imports one certificate per manifest row, taking its PDF from the ZIP archive.
+    Files are hashed, and only content not already stored is written, in parallel
+    by a bounded thread pool; rows are inserted in
+    executemany batches, each inside its own SAVEPOINT, so a bad row only costs
+    its own insert. Returns {"imported": [...], "failed": [{"row", "error"}]}.
+    """
+    config = current_app.config
+    rows = read_manifest(manifest_file)
+    try:
+        archive = zipfile.ZipFile(archive_file.stream)
+    except zipfile.BadZipFile:
+        raise ManifestError("Archive is not a valid ZIP file")
+    members = {os.path.basename(info.filename): info for info in archive.infolist() if not info.is_dir()}
+    owners = _resolve_owners(rows, requester_id, role)
+
+    failed, pending = [], []
+    for number, row in enumerate(rows, start=1):
+        name = row.get('file') or ''
+        info = members.get(os.path.basename(name))
+        if not row.get('title') or not row.get('client'):
+            failed.append({"row": number, "error": "title and client are required"})
+        elif not allowed_file(name):
+            failed.append({"row": number, "error": f"Unsupported file type: {name or '(missing)'}"})
+        elif info is None:
+            failed.append({"row": number, "error": f"{name} not found in archive"})
+        elif info.file_size > config['MAX_UPLOAD_SIZE']:
+            failed.append({"row": number, "error": f"{name} is too large"})
+        elif row.get('owner_email') and row['owner_email'] not in owners:
+            failed.append({"row": number, "error": f"Cannot import for {row['owner_email']}"})
+        else:
+            owner = owners.get(row.get('owner_email'), int(requester_id))
+            pending.append((number, row, info, owner))
+
+    # --- 1. Hash files in parallel (ZipFile serializes reads of the shared handle) ---
+    storage = get_storage()
+    max_size = config['MAX_UPLOAD_SIZE']
+
+    def hash_member(item):
+        with archive.open(item[2]) as member:
+            return hash_chunks(iter_chunks(member, max_size=max_size))
+
+    hashed, sizes = [], {}
+    with ThreadPoolExecutor(max_workers=config['BULK_IMPORT_WORKERS']) as pool:
+        futures = [(item, pool.submit(hash_member, item)) for item in pending]
+        for item, future in futures:
+            try:
+                digest, sizes[digest] = future.result()
+                hashed.append((*item, digest))
+            except Exception as e:
+                failed.append({"row": item[0], "error": f"Could not read file: {e}"})
+
+    # --- 2. Store each new piece of content once; duplicates share the stored object ---
+    keys = existing_keys({item[4] for item in hashed})
+    new = {}
+    for item in hashed:
+        if item[4] not in keys and item[4] not in new:
+            new[item[4]] = (item[2], content_key(item[4], item[2].filename))
+
+    def store(info, key):
+        with archive.open(info) as member:
+            storage.put_stream(key, iter_chunks(member, max_size=max_size))
+
+    with ThreadPoolExecutor(max_workers=config['BULK_IMPORT_WORKERS']) as pool:
+        futures = {digest: pool.submit(store, *args) for digest, args in new.items()}
+        errors = {}
+        for digest, future in futures.items():
+            try:
+                future.result()
+                keys[digest] = new[digest][1]
+            except Exception as e:
+                errors[digest] = e
+
+    stored = []
+    for item in hashed:
+        if item[4] in errors:
+            failed.append({"row": item[0], "error": f"Storage upload failed: {errors[item[4]]}"})
+        else:
+            stored.append((*item[:4], keys[item[4]], item[4]))
+
+    # --- 3. Insert rows in batches ---
+    imported, references = [], Counter()
+    batch_size = config['BULK_IMPORT_BATCH_SIZE']
+    for start in range(0, len(stored), batch_size):
+        batch = stored[start:start + batch_size]
+        try:
+            with db.session.begin_nested():
+                imported += _insert_batch(batch, storage)
+            references.update(item[5] for item in batch)
+        except Exception:
+            # Retry row by row to isolate the failures without losing the rest of the batch
+            for item in batch:
+                try:
+                    with db.session.begin_nested():
+                        imported += _insert_batch([item], storage)
+                    references[item[5]] += 1
+                except Exception as e:
+                    failed.append({"row": item[0], "error": f"Database insert failed: {e}"})
+    acquire_many(references, sizes, keys)
+    db.session.commit()
+
+    # Content written by this import that no row ended up using
+    for digest in new.keys() - errors.keys() - references.keys():
+        jobs.offer('delete_object', key=keys[digest])
+
+    failed.sort(key=lambda f: f["row"])
+    return {"imported": imported, "failed": failed}
+
+
+def _insert_batch(batch, storage):
+    upload_ids = db.session.execute(
+        insert(Upload).returning(Upload.id, sort_by_parameter_order=True),
+        [{"filename": info.filename, "filepath": storage.url(key), "storage_key": key, "sha256": digest,
+          "user_id": owner, "status": 'complete'} for _, _, info, owner, key, digest in batch]
+    ).scalars().all()
+
+    values = [certificate_values(row, owner, upload_id, storage.url(key))
+              for (_, row, _, owner, key, _), upload_id in zip(batch, upload_ids)]
+    db.session.execute(insert(Certificate), values)
+    record_created(values)
+    return [{"row": number, "upload_id": upload_id, "user_id": owner}
+            for (number, _, _, owner, _, _), upload_id in zip(batch, upload_ids)]
@@ -13,12 +13,56 @@ class Config:
     SQLALCHEMY_DATABASE_URI = _db_url or 'sqlite:///project_portal.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # --- CONNECTION POOL ---
+    # pre-ping replaces connections the server or a proxy dropped while idle, and
+    # recycle retires them before typical idle cutoffs, so the first request after
+    # a quiet period does not hit a dead socket
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 10))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = str(os.environ.get('DB_POOL_PRE_PING', 'True')).lower() == 'true'
+    # Postgres only; 0 disables
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))
+
+    SQLALCHEMY_ENGINE_OPTIONS = {"pool_pre_ping": DB_POOL_PRE_PING}
+    if not SQLALCHEMY_DATABASE_URI.startswith('sqlite'):
+        SQLALCHEMY_ENGINE_OPTIONS.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+    if SQLALCHEMY_DATABASE_URI.startswith('postgresql') and DB_STATEMENT_TIMEOUT_MS:
+        SQLALCHEMY_ENGINE_OPTIONS["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+
+    # Optional read replica for the read-only listing/stats routes (see replica.py)
+    _replica_url = os.environ.get('DATABASE_REPLICA_URL')
+    if _replica_url and _replica_url.startswith("postgres://"):
+        _replica_url = _replica_url.replace("postgres://", "postgresql://", 1)
+    SQLALCHEMY_BINDS = {'replica': _replica_url} if _replica_url else {}
+
     # --- SECURITY ---
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY')
     if not JWT_SECRET_KEY:
 
         raise ValueError("No JWT_SECRET_KEY set in environment variables!")
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
+    # Werkzeug hash spec. Raise the cost as hardware allows; older hashes are upgraded on next login
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+
+    # --- RATE LIMITING ---
+    RATELIMIT_ENABLED = str(os.environ.get('RATELIMIT_ENABLED', 'True')).lower() == 'true'
+    # 'memory' (per worker) or a redis:// URL shared by all workers
+    RATELIMIT_STORAGE_URL = os.environ.get('RATELIMIT_STORAGE_URL', 'memory')
+    # Reverse proxies in front of the app (Render's router is one; Render sets RENDER).
+    # ProxyFix takes the client address from that many X-Forwarded-For entries,
+    # so per-IP limits see clients instead of the proxy. 0 when clients connect directly.
+    RATELIMIT_PROXY_HOPS = int(os.environ.get('RATELIMIT_PROXY_HOPS', 1 if os.environ.get('RENDER') else 0))
+    LOGIN_RATE_LIMIT = os.environ.get('LOGIN_RATE_LIMIT', '10/minute')
+    # Failed logins per account; a successful login resets it
+    LOGIN_ACCOUNT_RATE_LIMIT = os.environ.get('LOGIN_ACCOUNT_RATE_LIMIT', '20/hour')
+    FORGOT_PASSWORD_RATE_LIMIT = os.environ.get('FORGOT_PASSWORD_RATE_LIMIT', '5/hour')
 
    # --- MAILING (SMTP) ---
     MAIL_SERVER = 'smtp.gmail.com'
@@ -29,4 +73,69 @@ class Config:
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME') 
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD') 
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_USERNAME')
-    UPLOAD_FOLDER = os.path.join(os.getcwd(), 'uploads')
\ No newline at end of file
+    UPLOAD_FOLDER = os.path.join(os.getcwd(), 'uploads')
+
+    # --- STORAGE ---
+    # 'supabase' in production, 'local' writes to UPLOAD_FOLDER (on-prem/offline),
+    # 'memory' keeps objects in the worker for tests and benchmarks
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'supabase')
+    SUPABASE_URL = os.environ.get('SUPABASE_URL')
+    SUPABASE_SERVICE_ROLE_KEY = os.environ.get('SUPABASE_SERVICE_ROLE_KEY')
+    MAX_UPLOAD_SIZE = int(os.environ.get('MAX_UPLOAD_MB', 50)) * 1024 * 1024
+    # Werkzeug refuses larger request bodies before parsing them; leaves room for form fields
+    MAX_CONTENT_LENGTH = MAX_UPLOAD_SIZE + 1024 * 1024
+    # Bulk import: manifest row cap, parallel storage uploads, rows per INSERT batch
+    BULK_IMPORT_MAX_ROWS = int(os.environ.get('BULK_IMPORT_MAX_ROWS', 2000))
+    BULK_IMPORT_WORKERS = int(os.environ.get('BULK_IMPORT_WORKERS', 8))
+    BULK_IMPORT_BATCH_SIZE = int(os.environ.get('BULK_IMPORT_BATCH_SIZE', 200))
+    BULK_IMPORT_MAX_SIZE = int(os.environ.get('BULK_IMPORT_MAX_MB', 500)) * 1024 * 1024
+    BULK_STATUS_MAX_IDS = int(os.environ.get('BULK_STATUS_MAX_IDS', 1000))
+    # Seconds a presigned direct-upload URL stays valid before it must be finalized
+    PRESIGNED_UPLOAD_TTL = int(os.environ.get('PRESIGNED_UPLOAD_TTL', 900))
+
+    # Post-upload PDF derivatives: preview width in pixels and the cap on stored text
+    THUMBNAIL_WIDTH = int(os.environ.get('THUMBNAIL_WIDTH', 320))
+    DERIVATIVE_MAX_TEXT = int(os.environ.get('DERIVATIVE_MAX_TEXT', 100000))
+    # Rows fetched per round-trip by the streaming export (also the unit flushed to the client)
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 2000))
+
+    # --- CACHING ---
+    # Seconds a worker may serve a cached dashboard rollup before recounting
+    STATS_CACHE_TTL = int(os.environ.get('STATS_CACHE_TTL', 30))
+    # Seconds a worker may trust a cached user role/team; commits in the same worker invalidate at once
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 60))
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 10000))
+
+    # --- BACKGROUND JOBS ---
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 4))
+    JOB_QUEUE_SIZE = int(os.environ.get('JOB_QUEUE_SIZE', 1000))
+    # Seconds enqueue() waits for room before giving up (backpressure on callers)
+    JOB_ENQUEUE_TIMEOUT = float(os.environ.get('JOB_ENQUEUE_TIMEOUT', 1))
+    # 'memory' (fire-and-forget) or 'db' (jobs table, survives restarts)
+    JOB_STORE = os.environ.get('JOB_STORE', 'memory')
+    JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 5))
+    JOB_RETRY_BASE_DELAY = float(os.environ.get('JOB_RETRY_BASE_DELAY', 2))
+    JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 5))
+    JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', 300))
+
+    # --- EXPIRY REMINDERS ---
+    # Days before valid_till/end_date at which reminders go out
+    EXPIRY_REMINDER_DAYS = os.environ.get('EXPIRY_REMINDER_DAYS', '30,7,1')
+    # Seconds between in-process checks; 0 leaves scheduling to cron (`flask expiry-reminders`)
+    EXPIRY_CHECK_INTERVAL = int(os.environ.get('EXPIRY_CHECK_INTERVAL', 3600))
+
+    # --- PUSH EVENTS ---
+    # 'memory' (single worker), 'postgres' (LISTEN/NOTIFY) or a redis:// URL to fan out across workers.
+    # Each open stream holds a worker thread: run Gunicorn with gthread or gevent workers.
+    EVENTS_BACKEND = os.environ.get('EVENTS_BACKEND', 'memory')
+    EVENTS_TOKEN_TTL = int(os.environ.get('EVENTS_TOKEN_TTL', 60))
+    EVENTS_HEARTBEAT = float(os.environ.get('EVENTS_HEARTBEAT', 15))
+    # Streams end after this long so clients reconnect and workers are recycled
+    EVENTS_MAX_STREAM_SECONDS = int(os.environ.get('EVENTS_MAX_STREAM_SECONDS', 300))
+    EVENTS_MAX_SUBSCRIBERS = int(os.environ.get('EVENTS_MAX_SUBSCRIBERS', 200))
+
+    # --- OBSERVABILITY ---
+    # Per-request latency/SQL/IO accounting and the Prometheus /metrics endpoint
+    METRICS_ENABLED = str(os.environ.get('METRICS_ENABLED', 'False')).lower() == 'true'
+    # Optional bearer token the scraper must send to /metrics
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
\ No newline at end of file
@@ -1,22 +1,76 @@
+from collections import namedtuple
+from itertools import chain
 from flask import jsonify
-from flask_jwt_extended import verify_jwt_in_request, get_jwt
+from flask_jwt_extended import verify_jwt_in_request, get_current_user
 from functools import wraps
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+from cache import TTLCache
+from config import Config
+
+# What authorization needs to know about a user; team holds everyone below them
+AuthUser = namedtuple('AuthUser', 'id role manager_id team')
+
+# Per-process, keyed by user id; entries are dropped when the user row changes
+user_cache = TTLCache(maxsize=Config.USER_CACHE_SIZE, ttl=Config.USER_CACHE_TTL)
+
+
+def load_user(user_id):
+    """Returns the AuthUser for user_id (cached), or None if the account is gone"""
+    return user_cache.get_or_set(int(user_id), lambda: _fetch_user(int(user_id)))
+
+def _fetch_user(user_id):
+    # Imported here: models imports metrics, which imports this module
+    from extensions import db
+    from models import User
+    from hierarchy import team_ids
+
+    row = db.session.execute(select(User.id, User.role, User.manager_id).where(User.id == user_id)).first()
+    if row is None:
+        return None
+    team = frozenset(db.session.scalars(team_ids(user_id, include_self=False))) if row.role == 'manager' else frozenset()
+    return AuthUser(row.id, row.role, row.manager_id, team)
+
+def current_user():
+    """The AuthUser behind this request's token, loaded once per request by the JWT user loader"""
+    verify_jwt_in_request()
+    return get_current_user()
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_user_changes(session, flush_context):
+    from models import User
+    changed = any(isinstance(o, User) for o in chain(session.new, session.deleted)) or any(
+        isinstance(o, User) and (get_history(o, 'role').has_changes() or get_history(o, 'manager_id').has_changes())
+        for o in session.dirty
+    )
+    if changed:
+        session.info['user_cache_stale'] = True
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_users(session):
+    # A role or reporting-line change also alters the teams of everyone above the user.
+    # Such edits are rare, so dropping every entry is simpler than tracing ancestors.
+    if session.info.pop('user_cache_stale', False):
+        user_cache.clear()
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_user_changes(session):
+    session.info.pop('user_cache_stale', None)
+
 
 def role_required(allowed_roles):
     def wrapper(fn):
         @wraps(fn)
         def decorator(*args, **kwargs):
 
-            verify_jwt_in_request()
-            
+            # Role comes from the (cached) user row, so a demotion takes effect before the token expires
+            user = current_user()
 
-            claims = get_jwt()
-            user_role = claims.get("role")
-            
-       
-            if not user_role or user_role not in allowed_roles:
+            if user.role not in allowed_roles:
                 return jsonify(message="Forbidden: Insufficient permissions. ❌"), 403
-            
+
             return fn(*args, **kwargs)
         return decorator
-    return wrapper
\ No newline at end of file
+    return wrapper
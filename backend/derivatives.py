@@ -0,0 +1,112 @@
+import io
+from flask import current_app
+from sqlalchemy import select
+from extensions import db
+from models import Upload, Derivative
+from jobs import jobs
+from storage import get_storage
+from utils import new_storage_key
+
+
+class NoPdfLibrary(Exception):
+    pass
+
+
+def render_pdf(data, width, max_text):
+    """
+    Returns (first-page PNG or None, text, page count). Uses PyMuPDF when it is
+    installed, else pypdf for the text only; both are optional dependencies.
+    """
+    try:
+        import fitz  # PyMuPDF
+    except ImportError:
+        fitz = None
+
+    if fitz is not None:
+        with fitz.open(stream=data, filetype="pdf") as doc:
+            png = None
+            if doc.page_count:
+                page = doc[0]
+                zoom = width / page.rect.width
+                png = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False).tobytes("png")
+            return png, _collect_text((page.get_text() for page in doc), max_text), doc.page_count
+
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise NoPdfLibrary("Install PyMuPDF (thumbnails and text) or pypdf (text only)")
+    reader = PdfReader(io.BytesIO(data))
+    return None, _collect_text(((page.extract_text() or "") for page in reader.pages), max_text), len(reader.pages)
+
+def _collect_text(pages, max_text):
+    parts, size = [], 0
+    for text in pages:
+        parts.append(text)
+        size += len(text)
+        # Pages are only read until the cap is reached
+        if size >= max_text:
+            break
+    return "\n".join(parts)[:max_text].replace("\x00", "")
+
+
+def queue_derivatives(upload_ids):
+    """Schedules derivative generation after commit; a full queue only delays it until the next backfill"""
+    if upload_ids:
+        jobs.offer('pdf_derivatives', upload_ids=list(upload_ids))
+
+
+def generate_derivatives(upload_ids):
+    """
+    Renders a thumbnail and extracts the text of each upload, storing the PNG next
+    to the original. Content that already has derivatives under another upload
+    (same sha256) is copied instead of rendered again. Uploads that already have
+    a derivative are skipped, so a retried job only redoes the missing ones.
+    """
+    config = current_app.config
+    storage = get_storage()
+    for upload_id in upload_ids:
+        up = db.session.get(Upload, upload_id)
+        if up is None or up.status != 'complete' or up.derivative is not None:
+            continue
+        derivative = Derivative(upload_id=up.id)
+
+        source = _existing(up.sha256) if up.sha256 else None
+        if source is not None:
+            derivative.status, derivative.text, derivative.page_count = source.status, source.text, source.page_count
+            png = storage.get(source.thumbnail_key) if source.thumbnail_key else None
+        elif not up.filename.lower().endswith('.pdf'):
+            derivative.status, png = 'unsupported', None
+        else:
+            # Storage errors propagate so the job is retried; render errors are final
+            data = storage.get(up.storage_key)
+            try:
+                png, derivative.text, derivative.page_count = render_pdf(
+                    data, config['THUMBNAIL_WIDTH'], config['DERIVATIVE_MAX_TEXT'])
+                derivative.status = 'ready'
+            except NoPdfLibrary as e:
+                # Left without a row so a backfill picks it up once a library is installed
+                print(f"Derivatives skipped for upload {up.id}: {e}")
+                continue
+            except Exception as e:
+                derivative.status, derivative.error, png = 'failed', str(e)[:500], None
+
+        if png:
+            derivative.thumbnail_key = new_storage_key("thumbnail.png")
+            storage.put(derivative.thumbnail_key, png, content_type="image/png")
+        db.session.add(derivative)
+        db.session.commit()
+
+def _existing(digest):
+    return db.session.scalars(
+        select(Derivative).join(Upload, Upload.id == Derivative.upload_id)
+        .where(Upload.sha256 == digest, Derivative.status == 'ready').limit(1)
+    ).first()
+
+
+def missing_derivatives(limit):
+    """Ids of completed uploads that have no derivative yet (oldest first), for backfills"""
+    return list(db.session.scalars(
+        select(Upload.id).outerjoin(Derivative, Derivative.upload_id == Upload.id)
+        .where(Upload.status == 'complete', Derivative.upload_id.is_(None))
+        .order_by(Upload.id).limit(limit)
+    ))
@@ -0,0 +1,82 @@
+import hashlib
+from functools import wraps
+from flask import current_app, make_response, request
+from flask_jwt_extended import verify_jwt_in_request, get_current_user
+from sqlalchemy import event, select, update, insert
+from sqlalchemy.orm import Session
+from extensions import db
+from models import TableVersion
+
+# Tables whose writes invalidate cached reads
+TRACKED_TABLES = ('certificates', 'tcil_certificates', 'users', 'derivatives')
+
+# The public manager list changes rarely; shared caches may serve it briefly without revalidating
+MANAGERS_CACHE_CONTROL = "public, max-age=60, stale-while-revalidate=300"
+
+
+# --- VERSION COUNTERS ---
+
+def ensure_version_rows(conn):
+    """Creates a zero counter for each tracked table (called by migrations.upgrade)"""
+    existing = set(conn.scalars(select(TableVersion.table_name)))
+    missing = [{"table_name": t, "version": 0} for t in TRACKED_TABLES if t not in existing]
+    if missing:
+        conn.execute(insert(TableVersion), missing)
+
+def _bump(conn, tables):
+    tables = sorted(set(tables) & set(TRACKED_TABLES))
+    if tables:
+        conn.execute(update(TableVersion).where(TableVersion.table_name.in_(tables))
+                     .values(version=TableVersion.version + 1))
+
+@event.listens_for(Session, 'after_flush')
+def _bump_flushed(session, flush_context):
+    changed = {o.__tablename__ for o in (*session.new, *session.dirty, *session.deleted)
+               if hasattr(o, '__tablename__')}
+    _bump(session.connection(), changed)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _bump_bulk(state):
+    # Bulk insert/update/delete through session.execute() never reaches the flush
+    if state.is_insert or state.is_update or state.is_delete:
+        _bump(state.session.connection(), [state.statement.table.name])
+
+def table_versions(tables):
+    return dict(db.session.execute(
+        select(TableVersion.table_name, TableVersion.version).where(TableVersion.table_name.in_(tables))
+    ).all())
+
+
+# --- CONDITIONAL GETS ---
+
+def conditional(*tables, per_user=True, cache_control="private, no-cache"):
+    """
+    Adds a strong ETag to a GET view and answers If-None-Match with 304 before the
+    view runs. The tag covers the URL, the caller (id, role and team, since they
+    decide what is visible; skipped for public views with per_user=False) and the
+    change counters of `tables`, so an unchanged
+    poll costs one primary-key lookup. It is computed before the view reads
+    anything, so a concurrent write can only make it stale towards a refetch.
+    """
+    def wrapper(fn):
+        @wraps(fn)
+        def decorator(*args, **kwargs):
+            versions = table_versions(tables)
+            parts = [request.full_path, repr(sorted(versions.items()))]
+            if per_user:
+                verify_jwt_in_request()
+                user = get_current_user()
+                parts += [str(user.id), user.role, str(hash(user.team))]
+            etag = hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+            if etag in request.if_none_match:
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(fn(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = cache_control
+            return response
+        return decorator
+    return wrapper
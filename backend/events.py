@@ -0,0 +1,212 @@
+import json
+import queue
+import select as selectors
+import threading
+import time
+from flask import current_app
+from sqlalchemy import text
+from extensions import db
+from hierarchy import manager_ids
+
+ADMINS = 'admins'  # channel every admin listens on
+
+
+class LocalHub:
+    """Delivers events to the subscribers connected to this worker"""
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channels, maxsize=100):
+        sub = (tuple(channels), queue.Queue(maxsize=maxsize))
+        with self._lock:
+            for channel in sub[0]:
+                self._subscribers.setdefault(channel, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            for channel in sub[0]:
+                subs = self._subscribers.get(channel)
+                if subs:
+                    subs.discard(sub)
+                    if not subs:
+                        del self._subscribers[channel]
+
+    def count(self):
+        with self._lock:
+            return len({s for subs in self._subscribers.values() for s in subs})
+
+    def deliver(self, channels, event):
+        with self._lock:
+            targets = {s for c in channels for s in self._subscribers.get(c, ())}
+        for _, q in targets:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                pass  # a stalled client misses events; it refetches on reconnect
+
+
+# --- FAN-OUT BACKENDS ---
+# With one worker 'memory' is enough. With several, every worker publishes through
+# the backend and a listener thread in each worker feeds its LocalHub.
+
+class MemoryBackend:
+    def __init__(self, hub):
+        self.hub = hub
+
+    def publish(self, message):
+        self.hub.deliver(message["channels"], message["event"])
+
+    def start(self):
+        pass
+
+
+class PostgresBackend:
+    """LISTEN/NOTIFY on the application database; payloads must stay under 8000 bytes"""
+
+    CHANNEL = 'certflow_events'
+
+    def __init__(self, hub, app):
+        self.hub = hub
+        self.app = app
+
+    def publish(self, message):
+        with db.engine.begin() as conn:
+            conn.execute(text("SELECT pg_notify(:channel, :payload)"),
+                         {"channel": self.CHANNEL, "payload": json.dumps(message)})
+
+    def start(self):
+        threading.Thread(target=self._listen, name="events-listener", daemon=True).start()
+
+    def _listen(self):
+        while True:
+            try:
+                # A dedicated DBAPI connection outside the pool: it stays in autocommit forever
+                with self.app.app_context():
+                    engine = db.engine
+                cargs, cparams = engine.dialect.create_connect_args(engine.url)
+                conn = engine.dialect.connect(*cargs, **cparams)
+                try:
+                    conn.autocommit = True
+                    conn.cursor().execute(f"LISTEN {self.CHANNEL}")
+                    while True:
+                        if selectors.select([conn], [], [], 30) == ([], [], []):
+                            continue
+                        conn.poll()
+                        while conn.notifies:
+                            message = json.loads(conn.notifies.pop(0).payload)
+                            self.hub.deliver(message["channels"], message["event"])
+                finally:
+                    conn.close()
+            except Exception as e:
+                print(f"Event listener error: {e}")
+                time.sleep(1)
+
+
+class RedisBackend:
+    CHANNEL = 'certflow:events'
+
+    def __init__(self, hub, url):
+        import redis  # optional dependency, only needed for this backend
+        self.hub = hub
+        self.client = redis.Redis.from_url(url)
+
+    def publish(self, message):
+        self.client.publish(self.CHANNEL, json.dumps(message))
+
+    def start(self):
+        threading.Thread(target=self._listen, name="events-listener", daemon=True).start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.CHANNEL)
+                for item in pubsub.listen():
+                    message = json.loads(item["data"])
+                    self.hub.deliver(message["channels"], message["event"])
+            except Exception as e:
+                print(f"Event listener error: {e}")
+                time.sleep(1)
+
+
+class EventBus:
+    def __init__(self):
+        self.hub = LocalHub()
+        self.backend = None
+        self._started = False
+        self._start_lock = threading.Lock()
+
+    def init_app(self, app):
+        kind = app.config['EVENTS_BACKEND']
+        if kind == 'postgres':
+            self.backend = PostgresBackend(self.hub, app)
+        elif kind.startswith(('redis://', 'rediss://')):
+            self.backend = RedisBackend(self.hub, kind)
+        else:
+            self.backend = MemoryBackend(self.hub)
+        app.extensions['events'] = self
+
+    def _ensure_started(self):
+        # Listener threads start on first use so they are created after Gunicorn forks
+        if self._started:
+            return
+        with self._start_lock:
+            if not self._started:
+                self.backend.start()
+                self._started = True
+
+    def publish(self, channels, event_type, **data):
+        """Sends {type, data} to everyone subscribed to any of `channels`; call after commit"""
+        self._ensure_started()
+        try:
+            self.backend.publish({"channels": [str(c) for c in channels],
+                                  "event": {"type": event_type, "data": data}})
+        except Exception as e:
+            # Pushes are best effort; clients still see the change on their next fetch
+            print(f"Event publish failed: {e}")
+
+    def subscribe(self, channels):
+        self._ensure_started()
+        return self.hub.subscribe([str(c) for c in channels])
+
+    def unsubscribe(self, sub):
+        self.hub.unsubscribe(sub)
+
+
+events = EventBus()
+
+
+def channels_for(user):
+    return [user.id, ADMINS] if user.role == 'admin' else [user.id]
+
+def publish_certificate_event(event_type, owner_id, **data):
+    """Notifies the owner, every manager above them and all admins"""
+    owner_id = int(owner_id)
+    channels = [owner_id, ADMINS, *db.session.scalars(manager_ids(owner_id))]
+    events.publish(channels, event_type, user_id=owner_id, **data)
+
+
+def stream(sub):
+    """SSE body: events as they arrive, a heartbeat comment while idle, then close for reconnect"""
+    config = current_app.config
+    heartbeat = config['EVENTS_HEARTBEAT']
+    deadline = time.monotonic() + config['EVENTS_MAX_STREAM_SECONDS']
+
+    def generate():
+        try:
+            # Ask EventSource to reconnect quickly when we end the stream
+            yield "retry: 2000\n\n"
+            while time.monotonic() < deadline:
+                try:
+                    event = sub[1].get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+        finally:
+            events.unsubscribe(sub)
+
+    return generate()
@@ -0,0 +1,138 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from flask import current_app
+from markupsafe import escape
+from sqlalchemy import select, exists, insert, delete, tuple_
+from sqlalchemy.orm import aliased
+from extensions import db
+from models import Certificate, TCILCertificate, ExpiryNotice, Upload, User
+from jobs import jobs, QueueFull
+
+
+def reminder_windows():
+    """EXPIRY_REMINDER_DAYS as ascending ints, e.g. '30,7,1' -> [1, 7, 30]"""
+    return sorted({int(d) for d in current_app.config['EXPIRY_REMINDER_DAYS'].split(',') if d.strip()})
+
+
+# --- QUERIES ---
+# Each is a range predicate on an indexed date column, so the database seeks
+# straight to the expiring rows instead of scanning the table.
+
+def expiring_tcil(start, end):
+    return select(TCILCertificate.id, TCILCertificate.name, TCILCertificate.valid_till.label('expires_on')) \
+        .where(TCILCertificate.valid_till >= start, TCILCertificate.valid_till <= end)
+
+def expiring_certificates(start, end):
+    return select(Certificate.id, Certificate.title, Certificate.client, Certificate.user_id,
+                  Certificate.end_date.label('expires_on')) \
+        .where(Certificate.end_date >= start, Certificate.end_date <= end)
+
+
+def _not_notified(kind, id_col, window):
+    return ~exists().where(ExpiryNotice.kind == kind, ExpiryNotice.item_id == id_col,
+                           ExpiryNotice.window_days == window)
+
+def _due(today):
+    """
+    Yields (kind, id, name, expires_on, window, recipient emails) for every item whose
+    tightest reminder window it has just entered and that has no notice for it yet.
+    Windows are disjoint ranges, e.g. (7, 30], (1, 7], [0, 1] days out.
+    """
+    admins = list(db.session.scalars(select(User.email).where(User.role == 'admin')))
+    manager = aliased(User)
+    lower = -1
+    for window in reminder_windows():
+        start, end = today + timedelta(days=lower + 1), today + timedelta(days=window)
+
+        tcil = db.session.execute(
+            expiring_tcil(start, end)
+            .add_columns(User.email)
+            .outerjoin(Upload, TCILCertificate.upload_id == Upload.id)
+            .outerjoin(User, Upload.user_id == User.id)
+            .where(_not_notified('tcil', TCILCertificate.id, window))
+        ).all()
+        for row in tcil:
+            yield 'tcil', row.id, row.name, row.expires_on, window, {*admins, *([row.email] if row.email else [])}
+
+        certs = db.session.execute(
+            expiring_certificates(start, end)
+            .add_columns(User.email, manager.email.label('manager_email'))
+            .join(User, Certificate.user_id == User.id)
+            .outerjoin(manager, User.manager_id == manager.id)
+            .where(_not_notified('certificate', Certificate.id, window))
+        ).all()
+        for row in certs:
+            yield 'certificate', row.id, f"{row.title} ({row.client})", row.expires_on, window, \
+                {row.email, *([row.manager_email] if row.manager_email else [])}
+        lower = window
+
+
+def _claim(notices):
+    """Inserts notice rows, skipping ones another run already wrote; returns the keys this run owns"""
+    if not notices:
+        return set()
+    dialect = db.engine.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(ExpiryNotice).on_conflict_do_nothing().returning(
+            ExpiryNotice.kind, ExpiryNotice.item_id, ExpiryNotice.window_days)
+        return set(map(tuple, db.session.execute(stmt, notices).all()))
+
+    claimed = set()
+    for notice in notices:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(ExpiryNotice), notice)
+            claimed.add((notice['kind'], notice['item_id'], notice['window_days']))
+        except Exception:
+            pass
+    return claimed
+
+
+def _release(claimed):
+    db.session.execute(delete(ExpiryNotice).where(
+        tuple_(ExpiryNotice.kind, ExpiryNotice.item_id, ExpiryNotice.window_days).in_(list(claimed))))
+    db.session.commit()
+
+
+def send_expiry_reminders(today=None):
+    """
+    Records a notice for every newly due item, then queues one digest email per
+    recipient covering all of their items. Safe to run from several workers or
+    cron at once: only the run whose notice insert wins sends the reminder.
+    Returns {"items": n, "emails": n}.
+    """
+    today = today or date.today()
+    due = list(_due(today))
+    claimed = _claim([{"kind": kind, "item_id": item_id, "window_days": window}
+                      for kind, item_id, _, _, window, _ in due])
+    db.session.commit()
+
+    by_recipient = defaultdict(list)
+    for kind, item_id, name, expires_on, window, recipients in due:
+        if (kind, item_id, window) in claimed:
+            for email in recipients:
+                by_recipient[email].append((kind, name, expires_on))
+
+    messages = [_digest(email, items, today) for email, items in by_recipient.items()]
+    if messages:
+        try:
+            jobs.enqueue('send_emails', messages=messages)
+        except QueueFull:
+            # Give the claims back so the retried job (or the next run) sends these reminders
+            _release(claimed)
+            raise
+    return {"items": len(claimed), "emails": len(messages)}
+
+
+def _digest(email, items, today):
+    rows = "".join(
+        f"<li>{'TCIL certificate' if kind == 'tcil' else 'Project certificate'}: {escape(name)} "
+        f"expires on {expires_on.isoformat()} ({(expires_on - today).days} days)</li>"
+        for kind, name, expires_on in sorted(items, key=lambda i: i[2])
+    )
+    return {"to": email, "subject": f"{len(items)} certificate(s) expiring soon",
+            "html": f"<p>The following certificates are about to expire:</p><ul>{rows}</ul>"}
@@ -0,0 +1,166 @@
+import csv
+import io
+import re
+import zipfile
+from xml.sax.saxutils import escape as xml_escape
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+from extensions import db
+from models import Certificate, User
+
+# (header, column) in export order
+EXPORT_COLUMNS = [
+    ("ID", Certificate.id),
+    ("Title", Certificate.title),
+    ("Client", Certificate.client),
+    ("Nature of Project", Certificate.nature_of_project),
+    ("Sub Nature of Project", Certificate.sub_nature_of_project),
+    ("Technologies", Certificate.technologies),
+    ("Value", Certificate.value),
+    ("Status", Certificate.status),
+    ("Project Status", Certificate.project_status),
+    ("Start Date", Certificate.start_date),
+    ("Go Live Date", Certificate.go_live_date),
+    ("End Date", Certificate.end_date),
+    ("Uploaded At", Certificate.timestamp),
+]
+EXPORT_HEADERS = [header for header, _ in EXPORT_COLUMNS] + ["Uploaded By", "Uploader Email", "Manager"]
+
+
+def export_query():
+    """Certificates with uploader and manager names, in id order; callers add the role scoping"""
+    manager = aliased(User)
+    return select(
+        *(column for _, column in EXPORT_COLUMNS),
+        User.name.label('uploaded_by'), User.email.label('uploader_email'), manager.name.label('manager'),
+    ).join(User, Certificate.user_id == User.id) \
+     .outerjoin(manager, User.manager_id == manager.id) \
+     .order_by(Certificate.id)
+
+
+def export_batches(stmt, batch_size):
+    """
+    Runs stmt on a server-side cursor and yields lists of row tuples, so only one
+    batch is ever held in memory (the driver streams on PostgreSQL; yield_per).
+    """
+    result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+    for partition in result.partitions():
+        yield [tuple(row) for row in partition]
+
+
+def _text(value):
+    if value is None:
+        return ""
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+
+# --- CSV ---
+
+def _csv_cell(value):
+    text = _text(value)
+    # Spreadsheets evaluate cells starting with these as formulas
+    return "'" + text if text[:1] in ('=', '+', '-', '@') and not isinstance(value, (int, float)) else text
+
+def stream_csv(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_HEADERS)
+    # BOM so Excel opens the file as UTF-8
+    yield "\ufeff" + buffer.getvalue()
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_csv_cell(v) for v in row] for row in batch)
+        yield buffer.getvalue()
+
+
+# --- XLSX ---
+# The smallest valid workbook: one sheet of inline strings, written through a zip
+# file whose output is drained after every batch, so nothing is built up in memory.
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Target="xl/workbook.xml" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Certificates" sheetId="1" r:id="rId1"/></sheets></workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+    '</Relationships>'
+)
+_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_END = '</sheetData></worksheet>'
+
+# Control characters are not allowed in XML 1.0
+_INVALID_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+class _Drain:
+    """Write-only file for ZipFile; has no tell(), so ZipFile streams with data descriptors"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _xlsx_row(values):
+    cells = []
+    for value in values:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            cells.append(f'<c><v>{value}</v></c>')
+        elif value is None:
+            cells.append('<c/>')
+        else:
+            text = xml_escape(_INVALID_XML.sub('', _text(value)))
+            cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return f'<row>{"".join(cells)}</row>'
+
+def stream_xlsx(batches):
+    out = _Drain()
+    with zipfile.ZipFile(out, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        archive.writestr('_rels/.rels', _ROOT_RELS)
+        archive.writestr('xl/workbook.xml', _WORKBOOK)
+        archive.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((_SHEET_START + _xlsx_row(EXPORT_HEADERS)).encode())
+            for batch in batches:
+                sheet.write("".join(_xlsx_row(row) for row in batch).encode())
+                yield out.take()
+            sheet.write(_SHEET_END.encode())
+    yield out.take()
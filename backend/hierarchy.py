@@ -0,0 +1,94 @@
+from sqlalchemy import event, select, delete, insert, literal, func, exists
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+from extensions import db
+from models import User, UserClosure
+
+
+# --- QUERIES ---
+
+def team_ids(manager_id, include_self=True):
+    """Subquery of every user reporting to manager_id, directly or indirectly"""
+    stmt = select(UserClosure.descendant_id).where(UserClosure.ancestor_id == manager_id)
+    if not include_self:
+        stmt = stmt.where(UserClosure.depth > 0)
+    return stmt
+
+def manager_ids(user_id):
+    """Subquery of every manager above user_id"""
+    return select(UserClosure.ancestor_id).where(UserClosure.descendant_id == user_id, UserClosure.depth > 0)
+
+def team_size(manager_id):
+    return db.session.scalar(select(func.count()).select_from(team_ids(manager_id).subquery()))
+
+def manages(manager_id, user_id):
+    return db.session.scalar(select(exists().where(
+        UserClosure.ancestor_id == manager_id,
+        UserClosure.descendant_id == user_id,
+        UserClosure.depth > 0
+    )))
+
+
+# --- MAINTENANCE ---
+
+def _attach(conn, user_id, manager_id):
+    """Links user_id's whole subtree under manager_id and all of its ancestors"""
+    above = UserClosure.__table__.alias('above')
+    below = UserClosure.__table__.alias('below')
+    conn.execute(insert(UserClosure).from_select(
+        ['ancestor_id', 'descendant_id', 'depth'],
+        select(above.c.ancestor_id, below.c.descendant_id, above.c.depth + below.c.depth + literal(1))
+        .select_from(above.join(below, below.c.ancestor_id == user_id))
+        .where(above.c.descendant_id == manager_id)
+    ))
+
+def _detach(conn, user_id):
+    """Removes every path from outside user_id's subtree into it"""
+    subtree = select(UserClosure.descendant_id).where(UserClosure.ancestor_id == user_id)
+    conn.execute(delete(UserClosure).where(
+        UserClosure.descendant_id.in_(subtree),
+        UserClosure.ancestor_id.not_in(subtree)
+    ))
+
+@event.listens_for(Session, 'after_flush')
+def _sync_closure(session, flush_context):
+    users = [o for o in session.new if isinstance(o, User)]
+    moved = [o for o in session.dirty if isinstance(o, User) and get_history(o, 'manager_id').has_changes()]
+    removed = [o for o in session.deleted if isinstance(o, User)]
+    if not (users or moved or removed):
+        return
+
+    conn = session.connection()
+    for user in removed:
+        conn.execute(delete(UserClosure).where(
+            (UserClosure.ancestor_id == user.id) | (UserClosure.descendant_id == user.id)
+        ))
+    # Self rows first, so a manager created in the same flush is ready to attach to
+    for user in users:
+        conn.execute(insert(UserClosure).values(ancestor_id=user.id, descendant_id=user.id, depth=0))
+    for user in users:
+        if user.manager_id:
+            _attach(conn, user.id, user.manager_id)
+    for user in moved:
+        _detach(conn, user.id)
+        if user.manager_id:
+            _attach(conn, user.id, user.manager_id)
+
+
+def rebuild_closure():
+    """Recomputes the closure table from users.manager_id (backfill / repair)"""
+    parents = dict(db.session.execute(select(User.id, User.manager_id)).all())
+    rows = []
+    for user_id in parents:
+        node, depth, seen = user_id, 0, set()
+        # Walk up the chain; `seen` guards against accidental manager cycles
+        while node is not None and node not in seen:
+            seen.add(node)
+            rows.append({"ancestor_id": node, "descendant_id": user_id, "depth": depth})
+            node, depth = parents.get(node), depth + 1
+
+    db.session.execute(delete(UserClosure))
+    if rows:
+        db.session.execute(insert(UserClosure), rows)
+    db.session.commit()
+    return len(rows)
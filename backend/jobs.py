@@ -0,0 +1,271 @@
+import json
+import queue
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime, timedelta
+from sqlalchemy import select, insert, update, or_, and_
+from extensions import db
+from models import Job
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobQueue:
+    """
+    Bounded in-process worker pool for work that should not block a request
+    (mail, storage deletes, post-upload processing).
+
+    With JOB_STORE='db' every job is also written to the `jobs` table first, so
+    jobs survive a worker restart and failed attempts are retried with exponential
+    backoff by whichever process polls the table next. With JOB_STORE='memory'
+    retries are kept in-process only.
+    """
+
+    def __init__(self):
+        self.tasks = {}
+        self.schedules = []
+        self.app = None
+        self._queue = None
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._waits = deque(maxlen=1000)
+        self._runs = deque(maxlen=1000)
+        self.counters = {"enqueued": 0, "completed": 0, "failed": 0, "retried": 0, "rejected": 0}
+        self.in_flight = 0
+
+    def init_app(self, app):
+        self.app = app
+        self._queue = queue.Queue(maxsize=app.config['JOB_QUEUE_SIZE'])
+        app.extensions['jobs'] = self
+        # Periodic jobs must run even if nothing is ever enqueued, so the first request starts the pool
+        app.before_request(self._ensure_started)
+
+    def task(self, name):
+        def register(fn):
+            self.tasks[name] = fn
+            return fn
+        return register
+
+    def every(self, config_key, name):
+        """Enqueues tasks[name]() every app.config[config_key] seconds in each worker (0 disables)"""
+        self.schedules.append((config_key, name))
+
+    @property
+    def durable(self):
+        return self.app.config['JOB_STORE'] == 'db'
+
+    def enqueue(self, name, **payload):
+        """Schedules tasks[name](**payload); payload must be JSON-serializable"""
+        if name not in self.tasks:
+            raise KeyError(f"Unknown job: {name}")
+        self._ensure_started()
+
+        job_id = self._insert(name, payload) if self.durable else None
+        item = (job_id, name, payload, 1, time.monotonic())
+        try:
+            self._queue.put(item, timeout=self.app.config['JOB_ENQUEUE_TIMEOUT'])
+        except queue.Full:
+            with self._stats_lock:
+                self.counters["rejected"] += 1
+            # A durable job is already in the table; the poller will pick it up later
+            if not self.durable:
+                raise QueueFull(f"Job queue is full ({self._queue.maxsize} pending)")
+        with self._stats_lock:
+            self.counters["enqueued"] += 1
+        return job_id
+
+    def offer(self, name, **payload):
+        """
+        enqueue() for follow-up work scheduled after a commit: a full queue is logged
+        and the job dropped instead of failing a request whose change already stands.
+        """
+        try:
+            return self.enqueue(name, **payload)
+        except QueueFull as e:
+            print(f"Job {name} not queued: {e}")
+            return None
+
+    def join(self):
+        """Blocks until every queued job has been attempted (CLI commands exit right after)"""
+        if self._threads:
+            self._queue.join()
+
+    def stats(self):
+        with self._stats_lock:
+            waits, runs = sorted(self._waits), sorted(self._runs)
+            return {
+                "queue_depth": self._queue.qsize() if self._queue else 0,
+                "queue_capacity": self._queue.maxsize if self._queue else 0,
+                "in_flight": self.in_flight,
+                "workers": len(self._threads),
+                **self.counters,
+                "wait_seconds": _summary(waits),
+                "run_seconds": _summary(runs),
+            }
+
+    # --- internals ---
+
+    def _ensure_started(self):
+        # Threads start on first use so they are created after Gunicorn forks
+        if self._threads:
+            return
+        with self._start_lock:
+            if self._threads:
+                return
+            for i in range(self.app.config['JOB_WORKERS']):
+                t = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+            if self.durable:
+                t = threading.Thread(target=self._poll, name="job-poller", daemon=True)
+                t.start()
+                self._threads.append(t)
+            for config_key, name in self.schedules:
+                interval = self.app.config[config_key]
+                if interval > 0:
+                    t = threading.Thread(target=self._repeat, args=(name, interval), name=f"job-timer-{name}", daemon=True)
+                    t.start()
+                    self._threads.append(t)
+
+    def _work(self):
+        while True:
+            job_id, name, payload, attempt, queued_at = self._queue.get()
+            started = time.monotonic()
+            with self._stats_lock:
+                self.in_flight += 1
+                self._waits.append(started - queued_at)
+            try:
+                with self.app.app_context():
+                    if job_id is not None and not self._claim(job_id):
+                        continue
+                    self.tasks[name](**payload)
+                    if job_id is not None:
+                        self._finish(job_id, 'done')
+                with self._stats_lock:
+                    self.counters["completed"] += 1
+            except Exception:
+                self._retry(job_id, name, payload, attempt, traceback.format_exc())
+            finally:
+                with self._stats_lock:
+                    self.in_flight -= 1
+                    self._runs.append(time.monotonic() - started)
+                self._queue.task_done()
+
+    def _retry(self, job_id, name, payload, attempt, error):
+        config = self.app.config
+        if attempt >= config['JOB_MAX_ATTEMPTS']:
+            print(f"Job {name} failed permanently: {error}")
+            with self._stats_lock:
+                self.counters["failed"] += 1
+            if job_id is not None:
+                with self.app.app_context():
+                    self._finish(job_id, 'failed', error)
+            return
+
+        delay = config['JOB_RETRY_BASE_DELAY'] * 2 ** (attempt - 1)
+        with self._stats_lock:
+            self.counters["retried"] += 1
+        if job_id is not None:
+            with self.app.app_context():
+                self._reschedule(job_id, attempt, delay, error)
+        else:
+            timer = threading.Timer(delay, self._requeue, args=((None, name, payload, attempt + 1, time.monotonic()),))
+            timer.daemon = True
+            timer.start()
+
+    def _requeue(self, item):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._stats_lock:
+                self.counters["rejected"] += 1
+
+    def _repeat(self, name, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                with self.app.app_context():
+                    self.enqueue(name)
+            except Exception as e:
+                print(f"Could not schedule {name}: {e}")
+
+    def _poll(self):
+        """Feeds due rows (new, retrying, or orphaned by a dead worker) from the jobs table"""
+        while True:
+            time.sleep(self.app.config['JOB_POLL_INTERVAL'])
+            free = self._queue.maxsize - self._queue.qsize()
+            if free <= 0:
+                continue
+            # Fresh jobs were already queued by enqueue(); only look at rows that have waited a full interval
+            cutoff = datetime.utcnow() - timedelta(seconds=self.app.config['JOB_POLL_INTERVAL'])
+            try:
+                with self.app.app_context():
+                    due = db.session.execute(
+                        select(Job.id, Job.name, Job.payload, Job.attempts)
+                        .where(_claimable(), Job.run_after <= cutoff)
+                        .order_by(Job.run_after)
+                        .limit(free)
+                    ).all()
+                    db.session.remove()
+            except Exception as e:
+                print(f"Job poller error: {e}")
+                continue
+            for job_id, name, payload, attempts in due:
+                self._requeue((job_id, name, json.loads(payload), attempts + 1, time.monotonic()))
+
+    def _insert(self, name, payload):
+        # Own transaction so the job row never depends on the caller's session state
+        with db.engine.begin() as conn:
+            result = conn.execute(insert(Job).values(
+                name=name, payload=json.dumps(payload), status='queued',
+                attempts=0, run_after=datetime.utcnow(), created_at=datetime.utcnow()
+            ))
+            return result.inserted_primary_key[0]
+
+    def _claim(self, job_id):
+        """Marks a due row as running; False if another worker or process got it first"""
+        with db.engine.begin() as conn:
+            # The lease lets another worker reclaim the job if this process dies mid-run
+            result = conn.execute(
+                update(Job).where(Job.id == job_id, _claimable())
+                .values(status='running', attempts=Job.attempts + 1,
+                        run_after=datetime.utcnow() + timedelta(seconds=self.app.config['JOB_LEASE_SECONDS']))
+            )
+            return result.rowcount == 1
+
+    def _finish(self, job_id, status, error=None):
+        with db.engine.begin() as conn:
+            conn.execute(update(Job).where(Job.id == job_id).values(
+                status=status, last_error=error, finished_at=datetime.utcnow()
+            ))
+
+    def _reschedule(self, job_id, attempt, delay, error):
+        with db.engine.begin() as conn:
+            conn.execute(update(Job).where(Job.id == job_id).values(
+                status='queued', last_error=error,
+                run_after=datetime.utcnow() + timedelta(seconds=delay)
+            ))
+
+
+def _claimable():
+    now = datetime.utcnow()
+    return or_(Job.status == 'queued', and_(Job.status == 'running', Job.run_after <= now))
+
+
+def _summary(values):
+    if not values:
+        return {"count": 0, "p50": None, "p99": None, "max": None}
+    return {
+        "count": len(values),
+        "p50": round(values[len(values) // 2], 4),
+        "p99": round(values[min(len(values) - 1, int(len(values) * 0.99))], 4),
+        "max": round(values[-1], 4),
+    }
+
+
+jobs = JobQueue()
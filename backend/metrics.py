@@ -0,0 +1,375 @@
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from flask import Blueprint, Response, current_app, g, has_request_context, jsonify, request
+from flask.json.provider import DefaultJSONProvider
+from flask_jwt_extended import jwt_required
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+from decorators import role_required
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, (counts, total, count) in sorted(self._series.items()):
+                base = _labels(self.labels, label_values)
+                for bound, n in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{_join(base, _le(bound))} {n}")
+                lines.append(f"{self.name}_bucket{_join(base, _le('+Inf'))} {count}")
+                lines.append(f"{self.name}_sum{_join(base)} {total}")
+                lines.append(f"{self.name}_count{_join(base)} {count}")
+        return lines
+
+
+class Registry:
+    """
+    Process-local metrics. Every Gunicorn worker keeps its own registry, so
+    Prometheus should scrape each worker (or sum the series) rather than the
+    load balancer.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.metrics = []
+        self.collectors = []
+
+    def histogram(self, *args, **kwargs):
+        metric = Histogram(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, fn):
+        """Registers fn() -> [(name, type, help, value)] evaluated at scrape time"""
+        self.collectors.append(fn)
+        return fn
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collect in self.collectors:
+            for name, kind, help, value in collect():
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+                # value is a number, or a list of ({label: value}, number) for a labelled series
+                if isinstance(value, list):
+                    lines += [f"{name}{_join(_labels(labels.keys(), labels.values()))} {v}" for labels, v in value]
+                else:
+                    lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(names, values):
+    return [f'{n}="{v}"' for n, v in zip(names, values)]
+
+def _le(bound):
+    return 'le="%s"' % bound
+
+def _join(labels, *extra):
+    parts = list(labels) + list(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+registry = Registry()
+
+request_seconds = registry.histogram(
+    "http_request_duration_seconds", "Request latency by endpoint",
+    labels=("endpoint", "method", "status"))
+request_sql_statements = registry.histogram(
+    "http_request_sql_statements", "SQL statements issued per request",
+    labels=("endpoint",), buckets=(1, 2, 3, 5, 10, 20, 50, 100))
+request_sql_seconds = registry.histogram(
+    "http_request_sql_seconds", "Time spent in SQL per request", labels=("endpoint",))
+sql_seconds = registry.histogram(
+    "db_statement_duration_seconds", "Latency of individual SQL statements")
+io_seconds = registry.histogram(
+    "external_io_seconds", "Latency of calls to external services", labels=("target",))
+section_seconds = registry.histogram(
+    "hot_path_seconds", "Time spent in instrumented hot paths", labels=("section",))
+pool_wait_seconds = registry.histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled database connection", labels=("pool",))
+
+
+# --- INSTRUMENTATION HELPERS ---
+
+@contextmanager
+def track_io(target):
+    """Times a call to an external service (storage, SMTP) and charges it to the request"""
+    if not registry.enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        io_seconds.observe(elapsed, target)
+        if has_request_context() and 'metrics_io' in g:
+            g.metrics_io += elapsed
+
+@contextmanager
+def timed(section):
+    """Times an in-process hot path such as password hashing"""
+    if not registry.enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        section_seconds.observe(time.perf_counter() - start, section)
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Charges JSON serialization of responses to the 'json' hot path"""
+
+    def response(self, *args, **kwargs):
+        with timed('json'):
+            return super().response(*args, **kwargs)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_start', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('metrics_start')
+    if not starts or not registry.enabled:
+        if starts:
+            starts.pop()
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    sql_seconds.observe(elapsed)
+    if has_request_context() and 'metrics_sql' in g:
+        g.metrics_sql[0] += 1
+        g.metrics_sql[1] += elapsed
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a free connection"""
+
+    metrics_name = 'primary'  # set to the bind key by init_metrics
+
+    def _do_get(self):
+        if not registry.enabled:
+            return super()._do_get()
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_wait_seconds.observe(time.perf_counter() - start, self.metrics_name)
+
+
+# --- SAMPLING PROFILER ---
+
+class SamplingProfiler:
+    """
+    Samples the stack of request threads serving one endpoint at a fixed interval
+    and aggregates collapsed stacks (flamegraph.pl format). Switched on and off
+    at runtime, so a single slow route can be profiled without a restart.
+    """
+
+    # Sleeping less than this turns the sampler into a busy loop
+    MIN_INTERVAL = 0.001
+    MAX_INTERVAL = 1.0
+
+    def __init__(self):
+        self.endpoint = None
+        self.interval = 0.005
+        self.samples = Counter()
+        self._threads = set()
+        self._lock = threading.Lock()
+        self._sampler = None
+
+    def start(self, endpoint, interval=0.005):
+        with self._lock:
+            self.endpoint = endpoint
+            self.interval = interval
+            self.samples.clear()
+            if self._sampler is None or not self._sampler.is_alive():
+                self._sampler = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+                self._sampler.start()
+
+    def stop(self):
+        with self._lock:
+            self.endpoint = None
+
+    def enter(self, endpoint):
+        if endpoint and endpoint == self.endpoint:
+            with self._lock:
+                self._threads.add(threading.get_ident())
+
+    def leave(self):
+        with self._lock:
+            self._threads.discard(threading.get_ident())
+
+    def _run(self):
+        while self.endpoint is not None:
+            time.sleep(self.interval)
+            with self._lock:
+                watched = list(self._threads)
+            frames = sys._current_frames()
+            stacks = []
+            for ident in watched:
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                    frame = frame.f_back
+                if stack:
+                    stacks.append(";".join(reversed(stack)))
+            with self._lock:
+                self.samples.update(stacks)
+
+    def report(self, top=50):
+        # Copied under the lock: ranking a Counter the sampler is resizing can raise
+        with self._lock:
+            samples = self.samples.copy()
+        return "\n".join(f"{stack} {count}" for stack, count in samples.most_common(top)) + "\n"
+
+
+profiler = SamplingProfiler()
+
+
+# --- MIDDLEWARE ---
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def scrape():
+    token = current_app.config['METRICS_TOKEN']
+    if token and request.headers.get('Authorization') != f"Bearer {token}":
+        return jsonify(message="Forbidden"), 403
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+@metrics_bp.route('/api/admin/profile', methods=['POST'])
+@jwt_required()
+@role_required(['admin'])
+def start_profile():
+    data = request.get_json() or {}
+    endpoint = data.get('endpoint')
+    if endpoint not in current_app.view_functions:
+        return jsonify(message=f"Unknown endpoint: {endpoint}"), 400
+    try:
+        interval = float(data.get('interval', 0.005))
+    except (TypeError, ValueError):
+        return jsonify(message="interval must be a number of seconds"), 400
+    if not profiler.MIN_INTERVAL <= interval <= profiler.MAX_INTERVAL:
+        return jsonify(message=f"interval must be between {profiler.MIN_INTERVAL} "
+                               f"and {profiler.MAX_INTERVAL} seconds"), 400
+    profiler.start(endpoint, interval)
+    return jsonify(message=f"Profiling {endpoint}"), 200
+
+@metrics_bp.route('/api/admin/profile', methods=['GET'])
+@jwt_required()
+@role_required(['admin'])
+def profile_report():
+    try:
+        top = int(request.args.get('top', 50))
+    except ValueError:
+        return jsonify(message="top must be an integer"), 400
+    if top < 1:
+        return jsonify(message="top must be at least 1"), 400
+    return Response(profiler.report(top), mimetype="text/plain")
+
+@metrics_bp.route('/api/admin/profile', methods=['DELETE'])
+@jwt_required()
+@role_required(['admin'])
+def stop_profile():
+    profiler.stop()
+    return jsonify(message="Profiler stopped"), 200
+
+
+def init_metrics(app):
+    """Opt-in (METRICS_ENABLED): per-request latency, SQL and external I/O accounting plus /metrics"""
+    if not app.config['METRICS_ENABLED']:
+        return
+    registry.enabled = True
+    app.json = TimedJSONProvider(app)
+
+    jobs = app.extensions.get('jobs')
+    if jobs is not None:
+        @registry.collector
+        def job_metrics():
+            stats = jobs.stats()
+            return [
+                ("jobs_queue_depth", "gauge", "Jobs waiting for a worker", stats["queue_depth"]),
+                ("jobs_in_flight", "gauge", "Jobs currently running", stats["in_flight"]),
+                ("jobs_completed_total", "counter", "Jobs finished successfully", stats["completed"]),
+                ("jobs_failed_total", "counter", "Jobs that exhausted their retries", stats["failed"]),
+                ("jobs_rejected_total", "counter", "Enqueues refused because the queue was full", stats["rejected"]),
+            ]
+
+    from extensions import db
+    with app.app_context():
+        pools = {key or 'primary': engine.pool for key, engine in db.engines.items()
+                 if isinstance(engine.pool, QueuePool)}
+    for name, pool in pools.items():
+        pool.metrics_name = name
+
+    @registry.collector
+    def pool_metrics():
+        gauges = [
+            ("db_pool_checked_out", "Connections currently in use", lambda p: p.checkedout()),
+            ("db_pool_idle", "Idle connections in the pool", lambda p: p.checkedin()),
+            ("db_pool_overflow", "Connections open beyond pool_size", lambda p: max(p.overflow(), 0)),
+        ]
+        return [(metric, "gauge", help, [({"pool": name}, read(pool)) for name, pool in pools.items()])
+                for metric, help, read in gauges]
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+        g.metrics_sql = [0, 0.0]
+        g.metrics_io = 0.0
+        profiler.enter(request.endpoint)
+
+    @app.after_request
+    def record_request(response):
+        if 'metrics_start' not in g:
+            return response
+        profiler.leave()
+        endpoint = request.endpoint or 'unmatched'
+        elapsed = time.perf_counter() - g.metrics_start
+        request_seconds.observe(elapsed, endpoint, request.method, response.status_code)
+        request_sql_statements.observe(g.metrics_sql[0], endpoint)
+        request_sql_seconds.observe(g.metrics_sql[1], endpoint)
+        # Server-Timing lets the browser devtools show the same breakdown per request
+        response.headers['Server-Timing'] = (
+            f"sql;dur={g.metrics_sql[1] * 1000:.1f}, io;dur={g.metrics_io * 1000:.1f}, "
+            f"total;dur={elapsed * 1000:.1f}"
+        )
+        return response
+
+    @app.teardown_request
+    def release_profiler(exc):
+        profiler.leave()
+
+    app.register_blueprint(metrics_bp)
@@ -0,0 +1,71 @@
+from datetime import datetime
+from sqlalchemy import inspect, text, select, update, func
+from extensions import db
+from search import install_search_index
+from etags import ensure_version_rows
+
+
+def _column_ddl(column, dialect):
+    ddl = f"{column.name} {column.type.compile(dialect=dialect)}"
+    if column.server_default is not None:
+        ddl += f" DEFAULT '{column.server_default.arg}'"
+    return ddl
+
+
+def upgrade():
+    """
+    Brings the schema up to date with models.py. Idempotent: creates missing tables,
+    then adds columns and indexes that create_all() will not add to existing tables.
+    New columns must be nullable or carry a server_default for this to work.
+    """
+    db.create_all()
+    engine = db.engine
+    inspector = inspect(engine)
+
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            existing = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {_column_ddl(column, engine.dialect)}"))
+
+            indexed = {i['name'] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexed:
+                    index.create(conn)
+
+        install_search_index(conn)
+        ensure_version_rows(conn)
+        backfilled = _backfill_certificate_timestamps(conn)
+
+    # Backfill the manager hierarchy closure for users created before it existed
+    from hierarchy import rebuild_closure
+    from models import User, UserClosure
+    users = db.session.scalar(select(func.count(User.id)))
+    self_rows = db.session.scalar(select(func.count()).select_from(UserClosure).where(UserClosure.depth == 0))
+    if users != self_rows:
+        rebuild_closure()
+
+    # Backfill the reporting summary for certificates created before it existed, or
+    # recount its months after timestamps were backfilled
+    from reports import rebuild_summary
+    from models import Certificate, CertificateSummary
+    if backfilled or (db.session.scalar(select(CertificateSummary.user_id).limit(1)) is None
+                      and db.session.scalar(select(Certificate.id).limit(1)) is not None):
+        rebuild_summary()
+
+
+def _backfill_certificate_timestamps(conn):
+    """
+    Gives certificates without a timestamp their upload's (or the epoch), then
+    enforces NOT NULL where the database can alter the column. Returns the row count.
+    """
+    from models import Certificate, Upload
+    upload_time = select(Upload.timestamp).where(Upload.id == Certificate.upload_id).scalar_subquery()
+    count = conn.execute(
+        update(Certificate).where(Certificate.timestamp.is_(None))
+        .values(timestamp=func.coalesce(upload_time, datetime(1970, 1, 1)))
+    ).rowcount
+    if conn.dialect.name == 'postgresql':
+        conn.execute(text('ALTER TABLE certificates ALTER COLUMN "timestamp" SET NOT NULL'))
+    return count
@@ -1,6 +1,9 @@
 from datetime import datetime
+from functools import lru_cache
+from flask import current_app
 from werkzeug.security import generate_password_hash, check_password_hash
 from extensions import db  
+from metrics import timed
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -9,8 +12,8 @@ class User(db.Model):
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.Text, nullable=False)
-    role = db.Column(db.String(20), default='employee') # admin, manager, employee
-    manager_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    role = db.Column(db.String(20), default='employee', index=True) # admin, manager, employee
+    manager_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True, index=True)
    
     employees = db.relationship('User', 
                                 backref=db.backref('manager', remote_side=[id]),
@@ -22,10 +25,44 @@ class User(db.Model):
     certificates = db.relationship('Certificate', backref='owner', lazy=True)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        with timed('password_hash'):
+            self.password_hash = generate_password_hash(password, method=current_app.config['PASSWORD_HASH_METHOD'])
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        with timed('password_hash'):
+            return check_password_hash(self.password_hash, password)
+
+    def needs_rehash(self):
+        """True if the stored hash was made with other parameters than PASSWORD_HASH_METHOD"""
+        return self.password_hash.split('$', 1)[0] != _hash_prefix(current_app.config['PASSWORD_HASH_METHOD'])
+
+
+@lru_cache(maxsize=None)
+def _hash_prefix(method):
+    # Werkzeug expands short specs ('scrypt') to full parameters in the stored hash
+    return generate_password_hash('', method=method).split('$', 1)[0]
+
+
+class UserClosure(db.Model):
+    """
+    Transitive closure of the manager hierarchy: one row per (manager, report) pair
+    at any depth, plus a depth-0 row per user. Maintained by hierarchy.py.
+    """
+    __tablename__ = 'user_closure'
+
+    ancestor_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    descendant_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True, index=True)
+    depth = db.Column(db.Integer, nullable=False)
+
+class Blob(db.Model):
+    """A stored object, addressed by content; refcount counts the uploads that point at it"""
+    __tablename__ = 'blobs'
+
+    sha256 = db.Column(db.String(64), primary_key=True)
+    storage_key = db.Column(db.String(255), nullable=False, index=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class Upload(db.Model):
     __tablename__ = 'uploads'
@@ -33,11 +70,19 @@ class Upload(db.Model):
     filename = db.Column(db.String(255), nullable=False)
     filepath = db.Column(db.String(512))
     timestamp = db.Column(db.DateTime, default=datetime.utcnow) # executes on creation
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), index=True)
+    storage_key = db.Column(db.String(255), nullable=True, index=True)
+    sha256 = db.Column(db.String(64), nullable=True, index=True)
+    # 'pending' while a presigned direct upload is outstanding, then 'complete'
+    status = db.Column(db.String(20), default='complete', server_default='complete')
+    expires_at = db.Column(db.DateTime, nullable=True)
+    # 'certificate' or 'tcil', fixed at presign so finalize cannot change which rules apply
+    kind = db.Column(db.String(20), nullable=True)
 
  
     tcil_certificate = db.relationship('TCILCertificate', back_populates='upload', uselist=False, cascade="all, delete-orphan")
     certificate = db.relationship('Certificate', back_populates='upload', uselist=False, cascade="all, delete-orphan")
+    derivative = db.relationship('Derivative', uselist=False, cascade="all, delete-orphan")
 
 class Certificate(db.Model):
     __tablename__ = 'certificates'
@@ -52,7 +97,7 @@ class Certificate(db.Model):
     sub_nature_of_project = db.Column(db.String(100), nullable=True)
     start_date = db.Column(db.Date, nullable=True)
     go_live_date = db.Column(db.Date, nullable=True)
-    end_date = db.Column(db.Date, nullable=True)
+    end_date = db.Column(db.Date, nullable=True, index=True)
     warranty_years = db.Column(db.String(20), nullable=True)
     om_years = db.Column(db.String(20), nullable=True)
     value = db.Column(db.String(50), nullable=True)
@@ -66,21 +111,97 @@ class Certificate(db.Model):
     
     filename = db.Column(db.String(256), nullable=False)
     status = db.Column(db.String(20), default='pending')
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    # Listings page on (timestamp, id), which has no place for NULL; upgrade() backfills old rows
+    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
   
     upload = db.relationship("Upload", back_populates="certificate")
 
     user = db.relationship('User', overlaps="certificates,owner")
 
+    # Shaped after the real access patterns: per-owner stats (user_id, status),
+    # per-owner newest-first listing (user_id, timestamp, id), status-filtered
+    # listings (status, timestamp, id) and the admin keyset listing (timestamp, id)
+    __table_args__ = (
+        db.Index('ix_certificates_user_status', 'user_id', 'status'),
+        db.Index('ix_certificates_user_timestamp', 'user_id', 'timestamp', 'id'),
+        db.Index('ix_certificates_status_timestamp', 'status', 'timestamp', 'id'),
+        db.Index('ix_certificates_timestamp_id', 'timestamp', 'id'),
+    )
+
 class TCILCertificate(db.Model):
     __tablename__ = 'tcil_certificates'
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
     valid_from = db.Column(db.Date, nullable=False)
-    valid_till = db.Column(db.Date, nullable=False)
+    valid_till = db.Column(db.Date, nullable=False, index=True)
     pdf_path = db.Column(db.Text, nullable=False)
 
     upload_id = db.Column(db.Integer, db.ForeignKey('uploads.id'))
-    upload = db.relationship('Upload', back_populates='tcil_certificate')
\ No newline at end of file
+    upload = db.relationship('Upload', back_populates='tcil_certificate')
+
+class Job(db.Model):
+    """Durable background job (only used when JOB_STORE='db')"""
+    __tablename__ = 'jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON kwargs
+    status = db.Column(db.String(20), default='queued')  # queued, running, done, failed
+    attempts = db.Column(db.Integer, default=0)
+    run_after = db.Column(db.DateTime, default=datetime.utcnow)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (db.Index('ix_jobs_status_run_after', 'status', 'run_after'),)
+
+class ExpiryNotice(db.Model):
+    """One row per reminder already sent, so the expiry job can be rerun safely"""
+    __tablename__ = 'expiry_notices'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # 'tcil' or 'certificate'
+    item_id = db.Column(db.Integer, nullable=False)
+    window_days = db.Column(db.Integer, nullable=False)
+    sent_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (db.UniqueConstraint('kind', 'item_id', 'window_days', name='uq_expiry_notices_item_window'),)
+
+class TableVersion(db.Model):
+    """Change counter per table, bumped in the writing transaction; read endpoints derive ETags from it"""
+    __tablename__ = 'table_versions'
+
+    table_name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class CertificateSummary(db.Model):
+    """
+    Certificate counts per owner and (dimension, value), e.g. ('client', 'ACME') or
+    ('month', '2025-01'). Kept current by the write paths; reports sum it instead of
+    scanning certificates.
+    """
+    __tablename__ = 'certificate_summary'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    dimension = db.Column(db.String(30), primary_key=True)
+    value = db.Column(db.String(200), primary_key=True)  # '' when the field is empty
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_certificate_summary_dimension', 'dimension', 'value'),
+    )
+
+class Derivative(db.Model):
+    """Thumbnail and text of an uploaded PDF, produced off the request path by the 'pdf_derivatives' job"""
+    __tablename__ = 'derivatives'
+
+    upload_id = db.Column(db.Integer, db.ForeignKey('uploads.id', ondelete='CASCADE'), primary_key=True)
+    # 'ready', 'failed' (unreadable PDF) or 'unsupported' (not a PDF)
+    status = db.Column(db.String(20), nullable=False)
+    thumbnail_key = db.Column(db.String(255), nullable=True)
+    page_count = db.Column(db.Integer, nullable=True)
+    text = db.Column(db.Text, nullable=True)
+    error = db.Column(db.String(500), nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
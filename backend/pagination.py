@@ -0,0 +1,71 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(timestamp, row_id):
+    """
+    Opaque cursor pointing just after (timestamp, id) in newest-first order.
+    The sort key may also be a number, e.g. a search rank.
+    """
+    key = timestamp.isoformat() if hasattr(timestamp, 'isoformat') else timestamp
+    raw = json.dumps([key, row_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Returns (timestamp, id) or raises ValueError for a malformed cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        ts, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if isinstance(ts, str):
+            ts = datetime.fromisoformat(ts)
+        elif ts is not None and not isinstance(ts, (int, float)):
+            raise TypeError
+        return ts, int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def parse_limit(value):
+    try:
+        limit = int(value) if value else DEFAULT_PAGE_SIZE
+    except (TypeError, ValueError):
+        limit = DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def keyset_page(stmt, ts_col, id_col, cursor, limit):
+    """
+    Applies newest-first keyset ordering to a select() and fetches one extra row
+    to know whether another page exists. Seeks with a plain OR/AND predicate so
+    an index on (timestamp, id) can serve it on both SQLite and Postgres.
+    Pass ts_col=None to page on the id alone.
+    """
+    if ts_col is None:
+        if cursor:
+            stmt = stmt.where(id_col < decode_cursor(cursor)[1])
+        return stmt.order_by(id_col.desc()).limit(limit + 1)
+
+    if cursor:
+        ts, row_id = decode_cursor(cursor)
+        if ts is None:
+            # ts_col < NULL matches nothing; sort keys are NOT NULL (see migrations.upgrade)
+            raise ValueError("Invalid cursor")
+        stmt = stmt.where(or_(ts_col < ts, and_(ts_col == ts, id_col < row_id)))
+
+    return stmt.order_by(ts_col.desc(), id_col.desc()).limit(limit + 1)
+
+
+def split_page(rows, limit, ts_attr='timestamp', id_attr='id'):
+    """Trims the look-ahead row and returns (rows, next_cursor)"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    ts = getattr(last, ts_attr) if ts_attr else None
+    return rows, encode_cursor(ts, getattr(last, id_attr))
@@ -0,0 +1,155 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, jsonify, make_response, request
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def parse_rate(value):
+    """'10/minute' -> (capacity 10, refill 10/60 tokens per second)"""
+    count, _, period = value.partition('/')
+    seconds = PERIODS.get(period.strip().rstrip('s'))
+    if not seconds or not count.strip().isdigit():
+        raise ValueError(f"Invalid rate limit: {value!r}")
+    return int(count), int(count) / seconds
+
+
+class MemoryStore:
+    """Token buckets in this worker only; the LRU bound keeps a spray of keys from growing it forever"""
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, cost=1):
+        """
+        Spends `cost` tokens; returns 0 if allowed, else the seconds until one is
+        available. cost=0 only checks the bucket.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            wait = 0 if tokens >= 1 else (1 - tokens) / rate
+            self._buckets[key] = (tokens - cost if wait == 0 else tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+
+class RedisStore:
+    """Token buckets shared by every worker; the whole update runs atomically inside Redis"""
+
+    SCRIPT = """
+        local capacity, rate, now, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+        local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+        local tokens = tonumber(bucket[1]) or capacity
+        local updated = tonumber(bucket[2]) or now
+        tokens = math.min(capacity, tokens + (now - updated) * rate)
+        local wait = 0
+        if tokens >= 1 then tokens = tokens - cost else wait = (1 - tokens) / rate end
+        redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+        redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+        return tostring(wait)
+    """
+
+    def __init__(self, url):
+        import redis  # optional dependency, only needed for a shared store
+        self._client = redis.Redis.from_url(url)
+        self._take = self._client.register_script(self.SCRIPT)
+
+    def take(self, key, capacity, rate, cost=1):
+        return float(self._take(keys=[f"ratelimit:{key}"], args=[capacity, rate, time.time(), cost]))
+
+    def reset(self, key):
+        self._client.delete(f"ratelimit:{key}")
+
+
+class RateLimiter:
+    def __init__(self):
+        self.store = None
+
+    def init_app(self, app):
+        url = app.config['RATELIMIT_STORAGE_URL']
+        self.store = RedisStore(url) if url.startswith(('redis://', 'rediss://')) else MemoryStore()
+        app.extensions['ratelimit'] = self
+        hops = app.config['RATELIMIT_PROXY_HOPS']
+        if hops:
+            # Only the entries the trusted proxies appended are used; anything further left is client-supplied
+            app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+
+    def limit(self, config_key, key_func):
+        """
+        Rejects a request with 429 once the bucket for key_func() is empty. The rate
+        is read from app.config[config_key] (e.g. '10/minute') and the check runs
+        before the view, so rejected requests never reach password hashing.
+        """
+        def wrapper(fn):
+            @wraps(fn)
+            def decorator(*args, **kwargs):
+                config = current_app.config
+                key = key_func()
+                if config['RATELIMIT_ENABLED'] and key:
+                    capacity, rate = parse_rate(config[config_key])
+                    wait = self.store.take(f"{config_key}:{key_func.__name__}:{key}", capacity, rate)
+                    if wait:
+                        return _too_many(wait)
+                return fn(*args, **kwargs)
+            return decorator
+        return wrapper
+
+    def limit_failures(self, config_key, key_func, failure_status=401):
+        """
+        Like limit(), but only responses with failure_status spend a token and a
+        successful response refills the bucket. Keyed on a submitted account, this
+        stops password guessing without letting a few bad attempts lock the owner out.
+        """
+        def wrapper(fn):
+            @wraps(fn)
+            def decorator(*args, **kwargs):
+                config = current_app.config
+                key = key_func()
+                if not (config['RATELIMIT_ENABLED'] and key):
+                    return fn(*args, **kwargs)
+                capacity, rate = parse_rate(config[config_key])
+                bucket = f"{config_key}:{key_func.__name__}:{key}"
+                wait = self.store.take(bucket, capacity, rate, cost=0)
+                if wait:
+                    return _too_many(wait)
+                response = make_response(fn(*args, **kwargs))
+                if response.status_code == failure_status:
+                    self.store.take(bucket, capacity, rate)
+                elif response.status_code < 400:
+                    self.store.reset(bucket)
+                return response
+            return decorator
+        return wrapper
+
+
+def _too_many(wait):
+    response = jsonify(message="Too many attempts. Please try again later.")
+    response.headers['Retry-After'] = str(math.ceil(wait))
+    return response, 429
+
+
+def client_ip():
+    # Already the client's own address behind RATELIMIT_PROXY_HOPS proxies (ProxyFix)
+    return request.remote_addr
+
+def submitted_email():
+    data = request.get_json(silent=True) or {}
+    email = data.get('email')
+    return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+
+limiter = RateLimiter()
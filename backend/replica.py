@@ -0,0 +1,51 @@
+from functools import wraps
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Select
+
+REPLICA_BIND = 'replica'
+
+
+class RoutingSession(Session):
+    """
+    Sends plain SELECTs to the 'replica' bind while a @read_only view is running.
+    Writes, flushes and anything outside such a view use the primary, and without
+    a configured replica everything does.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and isinstance(clause, Select)
+                and has_app_context() and g.get('read_replica')):
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_only(fn):
+    """
+    Routes the view's queries to the read replica; results may lag the primary by
+    the replication delay. Put it above @conditional so the ETag version check
+    reads the same database as the view.
+    """
+    @wraps(fn)
+    def decorator(*args, **kwargs):
+        g.read_replica = True
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            g.read_replica = False
+    return decorator
+
+
+def read_only_stream(chunks):
+    """
+    Wraps a streamed response body so its queries also use the replica. @read_only
+    resets the flag when the view returns, before the body has been read; wrap the
+    generator before passing it to stream_with_context.
+    """
+    g.read_replica = True
+    try:
+        yield from chunks
+    finally:
+        g.read_replica = False
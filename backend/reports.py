@@ -0,0 +1,108 @@
+from collections import Counter
+from sqlalchemy import select, update, delete, insert, func
+from extensions import db
+from models import Certificate, CertificateSummary
+
+DIMENSIONS = ('client', 'technology', 'nature_of_project', 'status', 'month')
+
+# Certificate columns the summary is derived from
+SOURCE_COLUMNS = ('user_id', 'client', 'technologies', 'nature_of_project', 'status', 'timestamp')
+
+
+def summary_keys(cert):
+    """(dimension, value) pairs a certificate counts towards; `cert` is a mapping of SOURCE_COLUMNS"""
+    keys = [
+        ('client', (cert['client'] or '').strip()),
+        ('nature_of_project', (cert['nature_of_project'] or '').strip()),
+        ('status', cert['status'] or ''),
+        ('month', cert['timestamp'].strftime('%Y-%m') if cert['timestamp'] else ''),
+    ]
+    # technologies is free text like 'Python, AWS'; each one is counted once
+    technologies = {t.strip() for t in (cert['technologies'] or '').split(',') if t.strip()}
+    keys += [('technology', t) for t in sorted(technologies)] or [('technology', '')]
+    return [(dimension, value[:200]) for dimension, value in keys]
+
+
+# --- INCREMENTAL MAINTENANCE ---
+# Called inside the writing transaction, so the summary commits or rolls back with the rows.
+
+def record_created(certs):
+    """Counts new certificates (mappings of SOURCE_COLUMNS, e.g. certificate_values())"""
+    apply_deltas(Counter(
+        (cert['user_id'], dimension, value) for cert in certs for dimension, value in summary_keys(cert)
+    ))
+
+def record_certificate(cert):
+    """record_created() for one Certificate model instance"""
+    record_created([{column: getattr(cert, column) for column in SOURCE_COLUMNS}])
+
+def record_status_change(changes, status):
+    """Moves certificates to `status`; `changes` holds (owner id, previous status) pairs"""
+    deltas = Counter()
+    for owner_id, previous in changes:
+        deltas[(owner_id, 'status', previous or '')] -= 1
+        deltas[(owner_id, 'status', status)] += 1
+    apply_deltas(deltas)
+
+def apply_deltas(deltas):
+    """Adds each {(user_id, dimension, value): n} to its summary row, creating missing rows"""
+    rows = [{"user_id": int(user_id), "dimension": dimension, "value": value, "count": n}
+            for (user_id, dimension, value), n in deltas.items() if n]
+    if not rows:
+        return
+    dialect = db.engine.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(CertificateSummary)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id', 'dimension', 'value'],
+            set_={"count": CertificateSummary.count + stmt.excluded.count}
+        )
+        db.session.execute(stmt, rows)
+        return
+
+    for row in rows:
+        updated = db.session.execute(
+            update(CertificateSummary)
+            .where(CertificateSummary.user_id == row["user_id"], CertificateSummary.dimension == row["dimension"],
+                   CertificateSummary.value == row["value"])
+            .values(count=CertificateSummary.count + row["count"])
+        ).rowcount
+        if not updated:
+            db.session.execute(insert(CertificateSummary), row)
+
+
+def rebuild_summary():
+    """Recomputes the summary from the certificates table (backfill / repair)"""
+    deltas = Counter()
+    columns = [getattr(Certificate, column) for column in SOURCE_COLUMNS]
+    for cert in db.session.execute(select(*columns).execution_options(yield_per=1000)).mappings():
+        for dimension, value in summary_keys(cert):
+            deltas[(cert['user_id'], dimension, value)] += 1
+
+    db.session.execute(delete(CertificateSummary))
+    apply_deltas(deltas)
+    db.session.commit()
+    return len(deltas)
+
+
+# --- QUERIES ---
+
+def breakdown(dimension, owners=None):
+    """
+    Certificate counts per value of `dimension`, largest first (months in order).
+    `owners` restricts it to those user ids (a list or subquery); None means everyone.
+    """
+    total = func.sum(CertificateSummary.count).label('count')
+    stmt = select(CertificateSummary.value, total) \
+        .where(CertificateSummary.dimension == dimension) \
+        .group_by(CertificateSummary.value) \
+        .having(total > 0)
+    if owners is not None:
+        stmt = stmt.where(CertificateSummary.user_id.in_(owners))
+    if dimension == 'month':
+        return stmt.order_by(CertificateSummary.value)
+    return stmt.order_by(total.desc(), CertificateSummary.value)
@@ -1,109 +1,343 @@
 import os
-import uuid
-import threading
-from datetime import datetime, timedelta
-from flask import Blueprint, jsonify, request, current_app
-from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token, get_jwt, decode_token
+import re
+from collections import Counter
+from datetime import date, datetime, timedelta
+from flask import Blueprint, jsonify, request, current_app, send_file, Response, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token, decode_token
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt import PyJWTError
 from werkzeug.utils import secure_filename
-from supabase import create_client
+from markupsafe import escape
+from sqlalchemy import select, update, func, literal
 
-from extensions import db, mail
-from flask_mail import Message
-from models import TCILCertificate, db, Upload, Certificate, User
-from decorators import role_required
-
-# --- CONFIGURATION ---
-SUPABASE_URL = os.environ.get("SUPABASE_URL")
-SUPABASE_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY") 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+from extensions import db
+from models import TCILCertificate, db, Upload, Certificate, User, Derivative
+from replica import read_only, read_only_stream
+from decorators import role_required, current_user, load_user
+from utils import allowed_file, parse_date, new_storage_key, certificate_values
+from pagination import keyset_page, split_page, parse_limit
+from cache import TTLCache
+from config import Config
+from jobs import jobs
+from expiry import reminder_windows, expiring_tcil, expiring_certificates
+from events import events, channels_for, publish_certificate_event, stream
+from etags import conditional, table_versions, MANAGERS_CACHE_CONTROL
+from ratelimit import limiter, client_ip, submitted_email
+from bulk_import import import_certificates, ManifestError
+from search import search_terms, apply_search
+from export import export_query, export_batches, stream_csv, stream_xlsx
+from derivatives import queue_derivatives
+from reports import DIMENSIONS, breakdown, record_certificate, record_status_change
+from hierarchy import team_ids, manager_ids, team_size as hierarchy_team_size
+from blobs import hash_chunks, content_key, acquire, release, existing_keys
+from storage import get_storage, iter_chunks, UploadTooLarge, LocalStorage, MemoryStorage
 
 routes_bp = Blueprint('routes', __name__, url_prefix='/api')
 
 # --- HELPERS ---
 
-def allowed_file(filename):
-    ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg'}
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-
-def parse_date(date_str):
-    if not date_str: return None
-    for fmt in ('%Y-%m-%d', '%d-%m-%Y'):
-        try: return datetime.strptime(date_str, fmt).date()
-        except: continue
-    return None
-
-def upload_to_supabase(file, bucket="certificates"):
-    """Uploads binary to Supabase and returns the permanent Public URL"""
-    ext = os.path.splitext(file.filename)[1]
-    # Unique name prevents overwriting files with the same name
-    unique_name = f"{uuid.uuid4().hex[:12]}{ext}"
-    
-    # Reset file pointer and read
-    file.seek(0)
-    file_binary = file.read()
-    
-    # Upload to Supabase Storage
-    
-    res = supabase.storage.from_(bucket).upload(
-        path=unique_name,
-        file=file_binary,
-        file_options={"content-type": "application/pdf"}
+def upload_to_storage(file):
+    """
+    Stores an uploaded file under its content hash; returns (key, public URL, sha256).
+    Content that is already stored only gains a reference and is not sent again.
+    """
+    # Werkzeug has already spooled the multipart body to a temp file, so it can be read
+    # twice: once to hash it, once (only if the content is new) to stream it out in chunks
+    max_size = current_app.config['MAX_UPLOAD_SIZE']
+    file.stream.seek(0)
+    digest, size = hash_chunks(iter_chunks(file.stream, max_size=max_size))
+    storage = get_storage()
+
+    def write(key):
+        file.stream.seek(0)
+        storage.put_stream(key, iter_chunks(file.stream, max_size=max_size),
+                           content_type=file.mimetype or "application/pdf")
+
+    key, _ = acquire(digest, size, content_key(digest, file.filename), write)
+    return key, storage.url(key), digest
+
+def build_certificate(fields, user_id, upload):
+    return Certificate(**certificate_values(fields, user_id, upload.id, upload.filepath))
+
+def build_tcil_certificate(fields, upload):
+    return TCILCertificate(
+        name=fields.get('name'),
+        valid_from=parse_date(fields.get('valid_from')),
+        valid_till=parse_date(fields.get('valid_till')),
+        pdf_path=upload.filepath,
+        upload_id=upload.id
     )
-    
-    # Return the direct public URL
-    return supabase.storage.from_(bucket).get_public_url(unique_name)
 
 # --- CORE LOGIC ---
 
+# Dashboard rollups keyed by (role, user_id); admins share one global entry. Each entry
+# holds the table versions it was computed at, so a write made through another worker
+# (which cannot pop this process's entries) still forces a recompute.
+stats_cache = TTLCache(maxsize=4096, ttl=Config.STATS_CACHE_TTL)
+STATS_TABLES = ('certificates', 'users')
+
+def stats_cache_key(role, user_id):
+    return ('admin', None) if role == 'admin' else (role, int(user_id))
+
+def invalidate_stats(owner_id):
+    """Drops every cached rollup that counts certificates owned by owner_id"""
+    stats_cache.pop(('employee', int(owner_id)))
+    stats_cache.pop(('manager', int(owner_id)))
+    for manager_id in db.session.scalars(manager_ids(owner_id)):
+        stats_cache.pop(('manager', manager_id))
+    stats_cache.pop(('admin', None))
+
+def compute_stats(role, user_id):
+    stmt = select(Certificate.status, func.count()).group_by(Certificate.status)
+
+    if role == 'admin':
+        team_size = db.session.scalar(select(func.count(User.id)))
+    elif role == 'manager':
+        # The whole reporting tree, not just direct reports; the closure row at depth 0 is the manager
+        stmt = stmt.where(Certificate.user_id.in_(team_ids(user_id)))
+        team_size = hierarchy_team_size(user_id)
+    else:
+        stmt = stmt.where(Certificate.user_id == user_id)
+        team_size = 1
+
+    by_status = dict(db.session.execute(stmt).all())
+    return {
+        "total_uploads": sum(by_status.values()),
+        "pending_approvals": by_status.get('pending', 0),
+        "approved": by_status.get('approved', 0),
+        "team_size": team_size
+    }
+
 @routes_bp.route('/dashboard/stats', methods=['GET'])
 @jwt_required()
+@read_only
+@conditional(*STATS_TABLES)
 def get_unified_stats():
-    user_id = get_jwt_identity()
-    role = get_jwt().get('role')
+    user = current_user()
+    user_id, role = user.id, user.role
+
+    key = stats_cache_key(role, user_id)
+    versions = table_versions(STATS_TABLES)
+    cached = stats_cache.get(key)
+    if cached is not None and cached[0] == versions:
+        stats = cached[1]
+    else:
+        stats = compute_stats(role, user_id)
+        stats_cache.set(key, (versions, stats))
+    return jsonify(stats), 200
+
+@routes_bp.route('/reports/breakdown', methods=['GET'])
+@jwt_required()
+@read_only
+@conditional('certificates')
+def get_report_breakdown():
+    """
+    Certificate counts by ?dimensions= (comma separated, default all of client,
+    technology, nature_of_project, status, month), scoped like the dashboard stats.
+    Served from the certificate_summary table, so the cost does not grow with the
+    number of certificates. ?limit= caps the values returned per dimension.
+    """
+    user = current_user()
+    dimensions = [d.strip() for d in request.args.get('dimensions', ','.join(DIMENSIONS)).split(',') if d.strip()]
+    unknown = [d for d in dimensions if d not in DIMENSIONS]
+    if unknown or not dimensions:
+        return jsonify(message=f"Unknown dimension(s): {', '.join(unknown)}. Use: {', '.join(DIMENSIONS)}"), 400
+    limit = request.args.get('limit', type=int)
+
+    if user.role == 'admin':
+        owners = None
+    elif user.role == 'manager':
+        owners = team_ids(user.id)
+    else:
+        owners = [user.id]
+
+    report = {}
+    for dimension in dimensions:
+        stmt = breakdown(dimension, owners)
+        if limit and limit > 0 and dimension != 'month':
+            stmt = stmt.limit(limit)
+        report[dimension] = [{"value": row.value or None, "count": row.count}
+                             for row in db.session.execute(stmt)]
+    return jsonify(report), 200
+
+# Columns a client may request via ?fields=; id/timestamp are always loaded for the cursor
+LISTING_FIELDS = {
+    "id", "title", "client", "status", "filename", "timestamp", "user_id",
+    "nature_of_project", "sub_nature_of_project", "start_date", "go_live_date",
+    "end_date", "value", "project_status", "technologies", "tcil_contact_person",
+    "thumbnail_url",
+}
+DEFAULT_LISTING_FIELDS = ["id", "title", "client", "status", "filename", "timestamp", "user_id"]
+
+def thumbnail_url(key):
+    return get_storage().url(key) if key else None
+
+def serialize_value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+def parse_fields(args):
+    fields = [f for f in args.get('fields', '').split(',') if f] or DEFAULT_LISTING_FIELDS
+    unknown = set(fields) - LISTING_FIELDS
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return fields
+
+def filter_certificates(stmt, role, user_id, args):
+    """
+    Scopes a certificates select() to what the caller may see, then applies the
+    common filters. Raises ValueError for a malformed filter.
+    """
+    owner = args.get('user_id')
+    if owner and not owner.isdigit():
+        # type=int would turn it into None, i.e. `user_id IS NULL`, and match nothing
+        raise ValueError("user_id must be an integer")
 
     if role == 'admin':
-        certs_q = Certificate.query
-        total_users = User.query.count()
+        if owner:
+            stmt = stmt.where(Certificate.user_id == int(owner))
     elif role == 'manager':
-        team_ids = [u.id for u in User.query.filter_by(manager_id=user_id).all()]
-        team_ids.append(int(user_id)) 
-        certs_q = Certificate.query.filter(Certificate.user_id.in_(team_ids))
-        total_users = len(team_ids)
+        stmt = stmt.where(Certificate.user_id.in_(team_ids(user_id)))
+        if owner:
+            stmt = stmt.where(Certificate.user_id == int(owner))
     else:
-        certs_q = Certificate.query.filter_by(user_id=user_id)
-        total_users = 1 
+        stmt = stmt.where(Certificate.user_id == user_id)
 
-    return jsonify({
-        "total_uploads": certs_q.count(),
-        "pending_approvals": certs_q.filter_by(status='pending').count(),
-        "approved": certs_q.filter_by(status='approved').count(),
-        "team_size": total_users
-    }), 200
+    if args.get('status'):
+        stmt = stmt.where(Certificate.status == args['status'])
+    if args.get('client'):
+        stmt = stmt.where(Certificate.client == args['client'])
+    return stmt
 
 @routes_bp.route('/certificates/all', methods=['GET'])
 @jwt_required()
+@read_only
+@conditional('certificates', 'derivatives')
 def get_all_certificates():
-    user_id = get_jwt_identity()
-    role = get_jwt().get('role', 'employee')
-    
-    if role == 'admin':
-        certs = Certificate.query.all()
-    elif role == 'manager':
-        team_ids = [u.id for u in User.query.filter_by(manager_id=user_id).all()]
-        team_ids.append(user_id)
-        certs = Certificate.query.filter(Certificate.user_id.in_(team_ids)).all()
-    else:
-        certs = Certificate.query.filter_by(user_id=user_id).all()
-
-    return jsonify([{
-        "id": c.id,
-        "title": c.title,
-        "client": c.client,
-        "status": c.status,
-        "filename": c.filename, # This is now the URL
-        "timestamp": c.timestamp.isoformat() if c.timestamp else None,
-        "user_id": c.user_id
-    } for c in certs]), 200
+    user = current_user()
+    user_id, role = user.id, user.role
+    args = request.args
+
+    try:
+        fields = parse_fields(args)
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
+
+    columns = [getattr(Certificate, f) for f in fields if f != 'thumbnail_url']
+    for required in ('id', 'timestamp'):
+        if required not in fields:
+            columns.append(getattr(Certificate, required))
+    stmt = select(*columns)
+    if 'thumbnail_url' in fields:
+        # Small PNG previews, so list views never have to fetch the PDFs themselves
+        stmt = stmt.add_columns(Derivative.thumbnail_key) \
+            .outerjoin(Derivative, Derivative.upload_id == Certificate.upload_id)
+    try:
+        stmt = filter_certificates(stmt, role, user_id, args)
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
+
+    date_from = parse_date(args.get('from'))
+    date_to = parse_date(args.get('to'))
+    if date_from:
+        stmt = stmt.where(Certificate.timestamp >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        # 'to' is inclusive of the whole day
+        stmt = stmt.where(Certificate.timestamp < datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+
+    total = None
+    if args.get('count', 'false').lower() == 'true':
+        total = db.session.scalar(select(func.count()).select_from(stmt.subquery()))
+
+    limit = parse_limit(args.get('limit'))
+    try:
+        page_stmt = keyset_page(stmt, Certificate.timestamp, Certificate.id, args.get('cursor'), limit)
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
+
+    rows, next_cursor = split_page(db.session.execute(page_stmt).all(), limit)
+
+    body = {
+        "certificates": [{
+            f: thumbnail_url(r.thumbnail_key) if f == 'thumbnail_url' else serialize_value(getattr(r, f))
+            for f in fields
+        } for r in rows],
+        "next_cursor": next_cursor,
+    }
+    if total is not None:
+        body["total"] = total
+    return jsonify(body), 200
+
+EXPORT_FORMATS = {
+    "csv": (stream_csv, "text/csv; charset=utf-8"),
+    "xlsx": (stream_xlsx, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+@routes_bp.route('/certificates/export', methods=['GET'])
+@jwt_required()
+@read_only
+def export_certificates():
+    """
+    Every certificate the caller may see, with uploader and manager names, as
+    ?format=csv (default) or xlsx; takes the same status/client/user_id filters as
+    the listing. Rows are streamed from a server-side cursor batch by batch, so
+    memory stays flat and bytes keep flowing however large the export is.
+    """
+    user = current_user()
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify(message="format must be 'csv' or 'xlsx'"), 400
+
+    render, mimetype = EXPORT_FORMATS[fmt]
+    try:
+        stmt = filter_certificates(export_query(), user.role, user.id, request.args)
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
+    body = read_only_stream(render(export_batches(stmt, current_app.config['EXPORT_BATCH_SIZE'])))
+    filename = f"certificates-{date.today().isoformat()}.{fmt}"
+    return Response(stream_with_context(body), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'Cache-Control': 'no-store',
+        'X-Accel-Buffering': 'no',
+    })
+
+@routes_bp.route('/certificates/search', methods=['GET'])
+@jwt_required()
+@read_only
+@conditional('certificates')
+def search_certificates():
+    """Ranked full-text search over certificate metadata, scoped like the listing"""
+    user = current_user()
+    user_id, role = user.id, user.role
+    args = request.args
+
+    terms = search_terms(args.get('q', ''))
+    if not terms:
+        return jsonify(message="Query parameter q is required"), 400
+    try:
+        fields = parse_fields(args)
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
+
+    columns = [getattr(Certificate, f) for f in fields]
+    if 'id' not in fields:
+        columns.append(Certificate.id)
+    try:
+        stmt = filter_certificates(select(*columns), role, user_id, args)
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
+    stmt, score = apply_search(stmt, terms, db.engine.dialect.name)
+
+    limit = parse_limit(args.get('limit'))
+    try:
+        page_stmt = keyset_page(stmt.add_columns(score.label('score')), score, Certificate.id, args.get('cursor'), limit)
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
+
+    rows, next_cursor = split_page(db.session.execute(page_stmt).all(), limit, ts_attr='score')
+    return jsonify(
+        certificates=[{**{f: serialize_value(getattr(r, f)) for f in fields}, "score": r.score} for r in rows],
+        next_cursor=next_cursor,
+    ), 200
 
 @routes_bp.route('/certificates', methods=['POST'])
 @jwt_required()
@@ -114,54 +348,152 @@ def upload_certificate():
    if not file or not allowed_file(file.filename):
         return jsonify(message='Valid PDF required'), 400
    try:
-        cloud_url = upload_to_supabase(file)
+        key, cloud_url, digest = upload_to_storage(file)
 
-        up = Upload(filename=file.filename, filepath=cloud_url, user_id=user_id)
+        up = Upload(filename=file.filename, filepath=cloud_url, storage_key=key, sha256=digest, user_id=user_id)
         db.session.add(up)
         db.session.flush()
 
-        cert = Certificate(
-            title=request.form.get('title'),
-            client=request.form.get('client'),
-            nature_of_project=request.form.get('nature_of_project'),
-            sub_nature_of_project=request.form.get('sub_nature_of_project'),
-            start_date=parse_date(request.form.get('start_date')),
-            go_live_date=parse_date(request.form.get('go_live_date')),
-            end_date=parse_date(request.form.get('end_date')),
-            value=request.form.get('value'),
-            status='pending',
-            filename=cloud_url, 
-            user_id=user_id,
-            upload_id=up.id,
-            timestamp=datetime.utcnow()
-        )
+        cert = build_certificate(request.form, user_id, up)
         db.session.add(cert)
+        record_certificate(cert)
         db.session.commit()
+        invalidate_stats(user_id)
+        publish_certificate_event('certificate.created', user_id, count=1)
+        queue_derivatives([up.id])
         return jsonify(message='Published to Cloud Storage', url=cloud_url), 201
+   except UploadTooLarge as e:
+        db.session.rollback()
+        return jsonify(message=str(e)), 413
    except Exception as e:
         db.session.rollback()
         return jsonify(message=f"Cloud Upload Failed: {str(e)}"), 500
     
+@routes_bp.route('/certificates/bulk', methods=['POST'])
+@jwt_required()
+def bulk_import_certificates():
+    """
+    Multipart: `manifest` (CSV or JSON rows with title, client, file and the other
+    certificate fields, optionally owner_email) plus `archive`, a ZIP of the files.
+    """
+    user = current_user()
+    user_id, role = user.id, user.role
+    # The archive may legitimately exceed the single-file MAX_CONTENT_LENGTH
+    request.max_content_length = current_app.config['BULK_IMPORT_MAX_SIZE']
+    manifest = request.files.get('manifest')
+    archive = request.files.get('archive')
+    if not manifest or not archive:
+        return jsonify(message="manifest and archive files are required"), 400
+
+    try:
+        result = import_certificates(manifest, archive, user_id, role)
+    except ManifestError as e:
+        return jsonify(message=str(e)), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify(message=f"Bulk import failed: {str(e)}"), 500
+
+    for owner_id, count in Counter(r["user_id"] for r in result["imported"]).items():
+        invalidate_stats(owner_id)
+        publish_certificate_event('certificate.created', owner_id, count=count)
+    queue_derivatives([r["upload_id"] for r in result["imported"]])
+    return jsonify(
+        message=f"Imported {len(result['imported'])} certificates, {len(result['failed'])} failed",
+        **result
+    ), 200 if result["imported"] or not result["failed"] else 400
+
 @routes_bp.route('/certificates/<int:cert_id>/status', methods=['PATCH'])
 @jwt_required()
 @role_required(['manager', 'admin'])
 def update_status(cert_id):
-    user_id = get_jwt_identity() 
-    user_role = get_jwt().get('role')
-    cert = Certificate.query.get_or_404(cert_id)
+    user = current_user()
+    # Locked so a concurrent change cannot move the summary counts from a stale status
+    cert = Certificate.query.filter_by(id=cert_id).with_for_update().first_or_404()
 
-    if user_role == 'manager':
-        sub_employee = User.query.get(cert.user_id)
-        if not sub_employee or str(sub_employee.manager_id) != str(user_id):
-            return jsonify(message="Unauthorized"), 403
+    if user.role == 'manager' and cert.user_id not in user.team:
+        return jsonify(message="Unauthorized"), 403
 
     status = request.get_json().get('status')
     if status in ['approved', 'rejected']:
+        if cert.status == status:
+            db.session.commit()
+            return jsonify(message=f"Status: {status}")
+        record_status_change([(cert.user_id, cert.status)], status)
         cert.status = status
         db.session.commit()
+        invalidate_stats(cert.user_id)
+        publish_certificate_event('certificate.status', cert.user_id, ids=[cert.id], status=status)
         return jsonify(message=f"Status: {status}")
     return jsonify(message="Invalid status"), 400
 
+@routes_bp.route('/certificates/status', methods=['PATCH'])
+@jwt_required()
+@role_required(['manager', 'admin'])
+def bulk_update_status():
+    """Sets one status on many certificates; returns a result per requested id"""
+    user = current_user()
+    data = request.get_json() or {}
+    status = data.get('status')
+    ids = data.get('ids')
+
+    if status not in ['approved', 'rejected']:
+        return jsonify(message="Invalid status"), 400
+    # type() rather than isinstance(): JSON true/false arrive as bool, an int subclass
+    if not isinstance(ids, list) or not ids or not all(type(i) is int for i in ids):
+        return jsonify(message="ids must be a non-empty list of certificate ids"), 400
+    if len(ids) > current_app.config['BULK_STATUS_MAX_IDS']:
+        return jsonify(message=f"At most {current_app.config['BULK_STATUS_MAX_IDS']} ids per request"), 400
+    ids = list(dict.fromkeys(ids))
+
+    # One query answers existence and authorization for every id. The rows stay locked
+    # (in id order, so concurrent batches cannot deadlock) until the commit, so the
+    # previous statuses the summary is moved from are the ones being overwritten.
+    allowed = Certificate.user_id.in_(team_ids(user.id, include_self=False)) if user.role == 'manager' else literal(True)
+    rows = db.session.execute(
+        select(Certificate.id, Certificate.user_id, Certificate.title, Certificate.status, User.email,
+               allowed.label('allowed'))
+        .join(User, User.id == Certificate.user_id)
+        .where(Certificate.id.in_(ids))
+        .order_by(Certificate.id)
+        .with_for_update(of=Certificate)
+    ).all()
+    found = {row.id: row for row in rows}
+    # Certificates already in this status are left alone: no summary move, event or mail
+    permitted = [row for row in rows if row.allowed and row.status != status]
+
+    if not permitted:
+        db.session.commit()
+    else:
+        db.session.execute(
+            update(Certificate).where(Certificate.id.in_([row.id for row in permitted])).values(status=status),
+            execution_options={"synchronize_session": False}
+        )
+        record_status_change([(row.user_id, row.status) for row in permitted], status)
+        db.session.commit()
+
+        by_owner = {}
+        for row in permitted:
+            by_owner.setdefault((row.user_id, row.email), []).append(row.title)
+        for owner_id, _ in by_owner:
+            invalidate_stats(owner_id)
+            publish_certificate_event('certificate.status', owner_id, status=status,
+                                      ids=[row.id for row in permitted if row.user_id == owner_id])
+        jobs.offer('send_emails', messages=[
+            {"to": email, "subject": f"Certificates {status}",
+             "html": "<p>The following certificates were " + status + ":</p><ul>"
+                     + "".join(f"<li>{escape(title)}</li>" for title in titles) + "</ul>"}
+            for (_, email), titles in by_owner.items()
+        ])
+
+    results = [
+        {"id": i, "result": "not_found"} if i not in found
+        else {"id": i, "result": "forbidden"} if not found[i].allowed
+        else {"id": i, "result": "unchanged" if found[i].status == status else "updated"}
+        for i in ids
+    ]
+    updated = sum(r["result"] == "updated" for r in results)
+    return jsonify(message=f"{updated} of {len(ids)} certificates set to {status}", status=status, results=results), 200
+
 @routes_bp.route('/tcil/upload', methods=['POST'])
 @jwt_required()
 def upload_tcil_official():
@@ -171,30 +503,321 @@ def upload_tcil_official():
         return jsonify(message='Only PDF allowed'), 400
 
     try:
-        cloud_url = upload_to_supabase(file)
-        up = Upload(filename=file.filename, filepath=cloud_url, user_id=user_id)
+        key, cloud_url, digest = upload_to_storage(file)
+        up = Upload(filename=file.filename, filepath=cloud_url, storage_key=key, sha256=digest, user_id=user_id)
         db.session.add(up)
         db.session.flush() 
 
-        new_tcil = TCILCertificate(
-            name=request.form.get('name'),
-            valid_from=parse_date(request.form.get('valid_from')),
-            valid_till=parse_date(request.form.get('valid_till')),
-            pdf_path=cloud_url, 
-            upload_id=up.id
-        )
+        new_tcil = build_tcil_certificate(request.form, up)
         db.session.add(new_tcil)
         db.session.commit()
+        queue_derivatives([up.id])
         return jsonify(msg="Published to Supabase"), 201
+    except UploadTooLarge as e:
+        db.session.rollback()
+        return jsonify(message=str(e)), 413
+    except Exception as e:
+        db.session.rollback()
+        return jsonify(message=str(e)), 500
+
+# --- DIRECT-TO-STORAGE UPLOADS ---
+# Step 1 (presign) and step 2 (finalize) are small JSON calls; the file itself goes
+# straight from the browser to the storage backend.
+
+@routes_bp.route('/uploads/presign', methods=['POST'])
+@jwt_required()
+def presign_upload():
+    user_id = get_jwt_identity()
+    data = request.get_json() or {}
+    filename = secure_filename(data.get('filename') or '')
+    kind = data.get('kind', 'certificate')
+
+    if kind not in ('certificate', 'tcil'):
+        return jsonify(message="kind must be 'certificate' or 'tcil'"), 400
+    if not allowed_file(filename) or (kind == 'tcil' and not filename.lower().endswith('.pdf')):
+        return jsonify(message='Valid PDF required'), 400
+    try:
+        size = int(data.get('size') or 0)
+    except (TypeError, ValueError):
+        return jsonify(message="size must be a number of bytes"), 400
+    if size > current_app.config['MAX_UPLOAD_SIZE']:
+        return jsonify(message="File is too large"), 413
+
+    digest = data.get('sha256')
+    if digest is not None and not (isinstance(digest, str) and re.fullmatch(r'[0-9a-f]{64}', digest)):
+        return jsonify(message="sha256 must be a lowercase hex SHA-256 digest"), 400
+
+    storage = get_storage()
+    # Content that is already stored is not sent again: the upload points at the existing
+    # object and the client skips the PUT. New content goes to a fresh key and is hashed
+    # and deduplicated by a job after finalize, so the bytes never pass through this worker.
+    existing = existing_keys([digest]).get(digest) if digest else None
+    key = existing or new_storage_key(filename)
+    ttl = current_app.config['PRESIGNED_UPLOAD_TTL']
+    up = Upload(
+        filename=filename,
+        filepath=storage.url(key),
+        storage_key=key,
+        sha256=digest if existing else None,
+        user_id=user_id,
+        status='pending',
+        kind=kind,
+        expires_at=datetime.utcnow() + timedelta(seconds=ttl)
+    )
+    db.session.add(up)
+    db.session.commit()
+
+    if existing:
+        return jsonify({"upload_id": up.id, "duplicate": True, "expires_at": up.expires_at.isoformat()}), 201
+
+    content_type = data.get('content_type') or 'application/pdf'
+    target = storage.presign_upload(key, content_type)
+    if target is None:
+        # Backend cannot sign URLs itself; accept the bytes through a tokenized endpoint. The
+        # token only opens this upload until it expires, and goes in a header so it stays
+        # out of URLs and access logs.
+        token = create_access_token(
+            identity=str(user_id),
+            expires_delta=up.expires_at - datetime.utcnow(),
+            additional_claims={"type": "upload", "upload_id": up.id}
+        )
+        target = {"url": f"{request.host_url.rstrip('/')}/api/uploads/{up.id}/blob",
+                  "headers": {"content-type": content_type, "x-upload-token": token}}
+
+    return jsonify({
+        "upload_id": up.id,
+        "method": "PUT",
+        "upload_url": target["url"],
+        "headers": target["headers"],
+        "expires_at": up.expires_at.isoformat()
+    }), 201
+
+@routes_bp.route('/uploads/<int:upload_id>/blob', methods=['PUT'])
+def put_upload_blob(upload_id):
+    """Receiving end of a presigned upload for backends without native URL signing"""
+    try:
+        claims = decode_token(request.headers.get('X-Upload-Token', ''))
+    except (PyJWTError, JWTExtendedException):
+        return jsonify(message="Invalid/Expired upload token"), 401
+    if claims.get('type') != 'upload' or claims.get('upload_id') != upload_id:
+        return jsonify(message="Invalid/Expired upload token"), 401
+
+    up = Upload.query.get_or_404(upload_id)
+    if up.status != 'pending':
+        return jsonify(message="Upload already finalized"), 409
+    if up.sha256:
+        # Points at shared, already stored content
+        return jsonify(message="Upload is a duplicate; nothing to send"), 409
+    try:
+        get_storage().put_stream(
+            up.storage_key,
+            iter_chunks(request.stream, max_size=current_app.config['MAX_UPLOAD_SIZE']),
+            content_type=request.mimetype or "application/pdf"
+        )
+    except UploadTooLarge as e:
+        return jsonify(message=str(e)), 413
+    return '', 204
+
+@routes_bp.route('/uploads/<int:upload_id>/finalize', methods=['POST'])
+@jwt_required()
+def finalize_upload(upload_id):
+    user_id = get_jwt_identity()
+    data = request.get_json() or {}
+    up = Upload.query.get_or_404(upload_id)
+    # Bound at presign, where the file type was checked against it
+    kind = up.kind or 'certificate'
+
+    if str(up.user_id) != str(user_id):
+        return jsonify(message="Unauthorized"), 403
+    if up.status != 'pending':
+        return jsonify(message="Upload already finalized"), 409
+    if up.expires_at and up.expires_at < datetime.utcnow():
+        return jsonify(message="Upload expired, request a new URL"), 410
+
+    storage = get_storage()
+    size = storage.size(up.storage_key)
+    if size is None:
+        return jsonify(message="File has not been uploaded yet"), 400
+    if size > current_app.config['MAX_UPLOAD_SIZE']:
+        if not up.sha256:
+            storage.delete(up.storage_key)
+        return jsonify(message="File is too large"), 413
+    if up.filename.lower().endswith('.pdf') and not storage.read_prefix(up.storage_key, 5).startswith(b"%PDF"):
+        if not up.sha256:
+            storage.delete(up.storage_key)
+        return jsonify(message="Uploaded file is not a PDF"), 400
+
+    try:
+        if up.sha256:
+            # Duplicate matched at presign: take a reference on the stored object
+            key, _ = acquire(up.sha256, size, up.storage_key)
+            up.storage_key, up.filepath = key, storage.url(key)
+
+        if kind == 'tcil':
+            db.session.add(build_tcil_certificate(data, up))
+        else:
+            cert = build_certificate(data, user_id, up)
+            db.session.add(cert)
+            record_certificate(cert)
+        up.status = 'complete'
+        up.expires_at = None
+        db.session.commit()
+        if not up.sha256:
+            jobs.offer('dedupe_upload', upload_id=up.id)
+        queue_derivatives([up.id])
+        if kind != 'tcil':
+            invalidate_stats(user_id)
+            publish_certificate_event('certificate.created', user_id, count=1)
+        return jsonify(message='Published to Cloud Storage', url=up.filepath), 201
     except Exception as e:
         db.session.rollback()
         return jsonify(message=str(e)), 500
 
+@routes_bp.route('/uploads/<int:upload_id>/derivatives', methods=['GET'])
+@jwt_required()
+@read_only
+def get_upload_derivatives(upload_id):
+    """Thumbnail URL, page count and (with ?text=true) the extracted text of an uploaded PDF"""
+    user = current_user()
+    up = Upload.query.get_or_404(upload_id)
+    if not (up.user_id == user.id or user.role == 'admin' or (user.role == 'manager' and up.user_id in user.team)):
+        return jsonify(message="Unauthorized"), 403
+
+    derivative = up.derivative
+    if derivative is None:
+        return jsonify(upload_id=up.id, status='pending'), 200
+    body = {
+        "upload_id": up.id,
+        "status": derivative.status,
+        "thumbnail_url": thumbnail_url(derivative.thumbnail_key),
+        "page_count": derivative.page_count,
+    }
+    if request.args.get('text', 'false').lower() == 'true':
+        body["text"] = derivative.text
+    return jsonify(body), 200
+
+@routes_bp.route('/expiring', methods=['GET'])
+@jwt_required()
+@read_only
+def get_expiring():
+    """TCIL and project certificates expiring within ?days= (default: the widest reminder window)"""
+    user = current_user()
+    days = request.args.get('days', type=int) or max(reminder_windows(), default=30)
+    if not 0 < days <= 366:
+        return jsonify(message="days must be between 1 and 366"), 400
+    limit = parse_limit(request.args.get('limit'))
+    today = date.today()
+    end = today + timedelta(days=days)
+    try:
+        expiring = filter_certificates(expiring_certificates(today, end), user.role, user.id, request.args)
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
+
+    tcil = db.session.execute(expiring_tcil(today, end).order_by(TCILCertificate.valid_till).limit(limit)).all()
+    certs = db.session.execute(expiring.order_by(Certificate.end_date).limit(limit)).all()
+
+    return jsonify({
+        "days": days,
+        "tcil": [{"id": r.id, "name": r.name, "valid_till": r.expires_on.isoformat(),
+                  "days_left": (r.expires_on - today).days} for r in tcil],
+        "certificates": [{"id": r.id, "title": r.title, "client": r.client, "user_id": r.user_id,
+                          "end_date": r.expires_on.isoformat(), "days_left": (r.expires_on - today).days}
+                         for r in certs],
+    }), 200
+
+# --- PUSH EVENTS ---
+# EventSource cannot send headers, so the stream authenticates with a short-lived
+# single-purpose token passed in the query string.
+
+@routes_bp.route('/events/token', methods=['POST'])
+@jwt_required()
+def events_token():
+    token = create_access_token(
+        identity=str(current_user().id),
+        expires_delta=timedelta(seconds=current_app.config['EVENTS_TOKEN_TTL']),
+        additional_claims={"type": "events"}
+    )
+    return jsonify(token=token), 200
+
+@routes_bp.route('/events/stream', methods=['GET'])
+def event_stream():
+    """Server-sent events: certificate.created and certificate.status for the caller's scope"""
+    try:
+        claims = decode_token(request.args.get('token', ''))
+    except Exception:
+        return jsonify(message="Invalid/Expired events token"), 401
+    user = load_user(claims['sub']) if claims.get('type') == 'events' else None
+    if user is None:
+        return jsonify(message="Invalid/Expired events token"), 401
+
+    if events.hub.count() >= current_app.config['EVENTS_MAX_SUBSCRIBERS']:
+        response = jsonify(message="Too many open event streams")
+        response.headers['Retry-After'] = '30'
+        return response, 503
+
+    sub = events.subscribe(channels_for(user))
+    return Response(stream(sub), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # stop nginx/Render proxies from buffering the stream
+    })
+
+@routes_bp.route('/admin/jobs', methods=['GET'])
+@jwt_required()
+@role_required(['admin'])
+def get_job_stats():
+    """Queue depth, throughput and latency of the background worker pool"""
+    return jsonify(jobs.stats()), 200
+
+@routes_bp.route('/files/<path:key>', methods=['GET'])
+def serve_local_file(key):
+    """Serves objects held by the local or in-memory storage backends"""
+    storage = get_storage()
+    if isinstance(storage, LocalStorage):
+        if not os.path.exists(storage.path(key)):
+            return jsonify(message="Not found"), 404
+        return send_file(storage.path(key))
+    if isinstance(storage, MemoryStorage) and key in storage.objects:
+        return Response(storage.get(key), mimetype=storage.content_type(key))
+    return jsonify(message="Not found"), 404
+
 # --- Updated TCIL List Route ---
 @routes_bp.route('/tcil/certificates', methods=['GET'])
 @jwt_required()
+@read_only
+@conditional('tcil_certificates', 'users', 'derivatives')
 def get_all_tcil():
-    certs = TCILCertificate.query.all()
+    args = request.args
+    # One joined column projection instead of lazy-loading upload and user per row
+    stmt = (
+        select(
+            TCILCertificate.id,
+            TCILCertificate.name,
+            TCILCertificate.valid_from,
+            TCILCertificate.valid_till,
+            TCILCertificate.pdf_path,
+            Upload.user_id.label('uploader_id'),
+            User.name.label('uploaded_by'),
+            Derivative.thumbnail_key,
+        )
+        .outerjoin(Upload, TCILCertificate.upload_id == Upload.id)
+        .outerjoin(User, Upload.user_id == User.id)
+        .outerjoin(Derivative, Derivative.upload_id == TCILCertificate.upload_id)
+    )
+
+    valid_till_from = parse_date(args.get('valid_till_from'))
+    valid_till_to = parse_date(args.get('valid_till_to'))
+    if valid_till_from:
+        stmt = stmt.where(TCILCertificate.valid_till >= valid_till_from)
+    if valid_till_to:
+        stmt = stmt.where(TCILCertificate.valid_till <= valid_till_to)
+
+    limit = parse_limit(args.get('limit'))
+    try:
+        page_stmt = keyset_page(stmt, None, TCILCertificate.id, args.get('cursor'), limit)
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
+    rows, next_cursor = split_page(db.session.execute(page_stmt).all(), limit, ts_attr=None)
+
     return jsonify({
         "certificates": [{
             "id": c.id,
@@ -202,31 +825,40 @@ def get_all_tcil():
             "valid_from": c.valid_from.isoformat() if c.valid_from else None,
             "valid_till": c.valid_till.isoformat() if c.valid_till else None,
             "filename": c.pdf_path, 
-            "uploaded_by": c.upload.user.name if c.upload else "System",
+            "thumbnail_url": thumbnail_url(c.thumbnail_key),
+            "uploaded_by": c.uploaded_by or "System",
             # Explicitly cast to int to match frontend localStorage userId
-            "uploader_id": int(c.upload.user_id) if c.upload else None
-        } for c in certs]
+            "uploader_id": int(c.uploader_id) if c.uploader_id is not None else None
+        } for c in rows],
+        "next_cursor": next_cursor
     }), 200
 
 @routes_bp.route('/tcil/certificates/<int:cert_id>', methods=['DELETE'])
 @jwt_required()
 def delete_tcil_cert(cert_id):
     cert = TCILCertificate.query.get_or_404(cert_id)
-    user_id = str(get_jwt_identity())
-    is_admin = get_jwt().get('role') == 'admin'
+    user = current_user()
 
-    if str(cert.upload.user_id) != user_id and not is_admin:
+    if cert.upload.user_id != user.id and user.role != 'admin':
         return jsonify(message="Unauthorized"), 403
         
     try:
-        # 1. Extract filename from the URL to delete from Supabase
-        # URL format: .../bucket/unique_name
-        cloud_filename = cert.pdf_path.split('/')[-1]
-        supabase.storage.from_("certificates").remove([cloud_filename])
+        up = cert.upload
+        if up and up.sha256:
+            # Shared content: only the last reference removes the object (None until then)
+            key = release(up.sha256)
+        else:
+            key = (up and up.storage_key) or get_storage().key_from_url(cert.pdf_path)
+        thumbnail = up.derivative.thumbnail_key if up and up.derivative else None
 
-        # 2. Delete from DB (The Upload record will be handled by your Cascade or manual delete)
-        db.session.delete(cert)
+        # 1. Delete from DB; removing the Upload cascades to the certificate
+        db.session.delete(up or cert)
         db.session.commit()
+
+        # 2. Remove the object from storage off the request path; retried on failure
+        for stale in (key, thumbnail):
+            if stale:
+                jobs.offer('delete_object', key=stale)
         return jsonify(msg="Removed from Cloud and DB"), 200
     except Exception as e:
         db.session.rollback()
@@ -234,50 +866,53 @@ def delete_tcil_cert(cert_id):
 
 # --- AUTH / EMAIL ---
 
-def send_async_email(app, message_data):
-    with app.app_context():
-        try:
-            msg = Message(
-                subject=message_data['subject'],
-                recipients=[message_data['to']],
-                html=message_data.get('html') 
-            )
-            mail.send(msg)
-        except Exception as e:
-            print(f"Email Error: {e}")
-
 @routes_bp.route('/auth/forgot-password', methods=['POST'])
+@limiter.limit('FORGOT_PASSWORD_RATE_LIMIT', client_ip)
+@limiter.limit('FORGOT_PASSWORD_RATE_LIMIT', submitted_email)
 def forgot_password():
     email = request.get_json().get('email')
     user = User.query.filter_by(email=email).first()
     if user:
         token = create_access_token(identity=str(user.id), expires_delta=timedelta(hours=1), additional_claims={"type": "password_reset"})
         link = f"https://tcil-frontend.onrender.com/reset-password/{token}"
-        msg_data = {"to": user.email, "subject": "Reset Password", "html": f"<p>Click <a href='{link}'>here</a></p>"}
-        app = current_app._get_current_object()
-        threading.Thread(target=send_async_email, args=(app, msg_data)).start()
+        jobs.offer('send_email', to=user.email, subject="Reset Password", html=f"<p>Click <a href='{link}'>here</a></p>")
     return jsonify(message="Reset email sent if account exists"), 200
 
 @routes_bp.route('/auth/reset-password/<token>', methods=['POST'])
 def reset_password(token):
     try:
         decoded = decode_token(token)
-        user = db.session.get(User, decoded['sub'])
-        user.set_password(request.get_json().get('password'))
-        db.session.commit()
-        return jsonify(msg="Password updated"), 200
-    except:
+    except (PyJWTError, JWTExtendedException):
+        return jsonify(msg="Invalid/Expired link"), 400
+    # Events and upload tokens share the signing key and travel in URLs; only reset links count
+    if decoded.get('type') != 'password_reset':
+        return jsonify(msg="Invalid/Expired link"), 400
+    user = db.session.get(User, int(decoded['sub']))
+    if user is None:
         return jsonify(msg="Invalid/Expired link"), 400
 
+    password = (request.get_json(silent=True) or {}).get('password')
+    if not password:
+        return jsonify(msg="Password is required"), 400
+    user.set_password(password)
+    db.session.commit()
+    return jsonify(msg="Password updated"), 200
+
 @routes_bp.route('/auth/managers', methods=['GET'])
+@conditional('users', per_user=False, cache_control=MANAGERS_CACHE_CONTROL)
 def get_managers():
     managers = User.query.filter(User.role.in_(['manager', 'admin'])).all()
     return jsonify([{"id": m.id, "name": m.name, "role": m.role} for m in managers]), 200
 
 @routes_bp.route('/certificates/<int:cert_id>', methods=['GET'])
 @jwt_required()
+@read_only
+@conditional('certificates')
 def get_certificate_by_id(cert_id):
+    user = current_user()
     cert = Certificate.query.get_or_404(cert_id)
+    if user.role != 'admin' and cert.user_id != user.id and cert.user_id not in user.team:
+        return jsonify(message="Unauthorized"), 403
     # Ensure all fields sent from UploadPage are included in the response
     return jsonify({
         "id": cert.id,
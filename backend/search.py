@@ -0,0 +1,104 @@
+import re
+from sqlalchemy import text, func, literal, literal_column, or_, table, column
+from models import Certificate
+
+# Searchable metadata, most significant first (weights follow this order)
+SEARCH_COLUMNS = ('title', 'client', 'technologies', 'nature_of_project',
+                  'sub_nature_of_project', 'tcil_contact_person')
+
+MAX_TERMS = 8
+
+fts = table('certificates_fts', column('rowid'))
+
+
+# --- INDEX MAINTENANCE ---
+
+def install_search_index(conn):
+    """
+    Creates the full-text index for the current dialect if it is missing.
+    Postgres keeps a generated tsvector column behind a GIN index; SQLite keeps an
+    external-content FTS5 table synced by triggers. Both update on insert and on
+    updates to the indexed columns, so no application code has to maintain them.
+    """
+    if conn.dialect.name == 'postgresql':
+        _install_postgres(conn)
+    elif conn.dialect.name == 'sqlite':
+        _install_sqlite(conn)
+
+def _install_postgres(conn):
+    title, client, *rest = SEARCH_COLUMNS
+    others = " || ' ' || ".join(f"coalesce({c}, '')" for c in rest)
+    conn.execute(text(f"""
+        ALTER TABLE certificates ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce({title}, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce({client}, '')), 'B') ||
+            setweight(to_tsvector('simple', {others}), 'C')
+        ) STORED
+    """))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_certificates_search ON certificates USING GIN (search_vector)"))
+
+def _install_sqlite(conn):
+    exists = conn.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'certificates_fts'"
+    )).first()
+    cols = ", ".join(SEARCH_COLUMNS)
+    new = ", ".join(f"new.{c}" for c in SEARCH_COLUMNS)
+    old = ", ".join(f"old.{c}" for c in SEARCH_COLUMNS)
+
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS certificates_fts USING fts5({cols}, "
+        f"content='certificates', content_rowid='id')"
+    ))
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS certificates_fts_insert AFTER INSERT ON certificates BEGIN
+            INSERT INTO certificates_fts (rowid, {cols}) VALUES (new.id, {new});
+        END
+    """))
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS certificates_fts_delete AFTER DELETE ON certificates BEGIN
+            INSERT INTO certificates_fts (certificates_fts, rowid, {cols}) VALUES ('delete', old.id, {old});
+        END
+    """))
+    # Status changes are the most frequent update and do not touch the index
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS certificates_fts_update AFTER UPDATE OF {cols} ON certificates BEGIN
+            INSERT INTO certificates_fts (certificates_fts, rowid, {cols}) VALUES ('delete', old.id, {old});
+            INSERT INTO certificates_fts (rowid, {cols}) VALUES (new.id, {new});
+        END
+    """))
+    if not exists:
+        conn.execute(text("INSERT INTO certificates_fts (certificates_fts) VALUES ('rebuild')"))
+
+
+# --- QUERIES ---
+
+def search_terms(q):
+    """Splits user input into at most MAX_TERMS plain word tokens (no query syntax is passed through)"""
+    return re.findall(r'\w+', q.lower())[:MAX_TERMS]
+
+def apply_search(stmt, terms, dialect):
+    """
+    Restricts a select() over certificates to rows matching every term (as a
+    prefix, so partial words match while typing) and returns (stmt, score),
+    where a higher score is a better match.
+    """
+    if dialect == 'postgresql':
+        query = func.to_tsquery('simple', " & ".join(f"{t}:*" for t in terms))
+        vector = literal_column('certificates.search_vector')
+        return stmt.where(vector.op('@@')(query)), func.ts_rank(vector, query)
+
+    if dialect == 'sqlite':
+        match = " ".join(f'"{t}"*' for t in terms)
+        # bm25() is lower-is-better; weights favour title and client matches
+        weights = ", ".join(str(w) for w in (10.0, 5.0, 1.0, 1.0, 1.0, 1.0))
+        score = -literal_column(f"bm25(certificates_fts, {weights})")
+        stmt = stmt.join(fts, fts.c.rowid == Certificate.id).where(
+            literal_column('certificates_fts').op('MATCH')(match)
+        )
+        return stmt, score
+
+    # No full-text support: unranked substring match
+    for t in terms:
+        stmt = stmt.where(or_(*(getattr(Certificate, c).ilike(f"%{t}%") for c in SEARCH_COLUMNS)))
+    return stmt, literal(0.0)
@@ -1,17 +1,27 @@
 import os
+import random
+import argparse
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import insert, select
+from werkzeug.security import generate_password_hash
 from app import create_app
 from extensions import db
-from models import User
+from models import User, Upload, Certificate
+from hierarchy import rebuild_closure
+from reports import rebuild_summary
+from migrations import upgrade
 from dotenv import load_dotenv
 
 load_dotenv()
 
-app = create_app()
+STATUSES = ['pending', 'approved', 'rejected']
+CLIENTS = ['BSNL', 'MTNL', 'NIC', 'ISRO', 'DoT', 'Railways', 'NHAI', 'C-DOT']
+TECHNOLOGIES = ['Python', 'Java', 'React', 'PostgreSQL', 'Kubernetes', 'SAP', 'Oracle', '5G']
 
-def seed_data():
+def seed_data(app):
     with app.app_context():
-        db.create_all()
-        
+        upgrade()
         admin_email = os.getenv("ADMIN_EMAIL", "admin@tcil.com")
         admin_password = os.getenv("ADMIN_PASSWORD")
 
@@ -34,5 +44,78 @@ def seed_data():
         else:
             print("ℹ️ Admin already exists...")
 
+def seed_synthetic(directors=5, managers_per_director=4, employees_per_manager=10,
+                   certificates=10000, password="password", batch_size=5000):
+    """
+    Bulk-loads a synthetic org chart (admin -> directors -> managers -> employees) and
+    `certificates` rows spread across the employees. Rows go in with executemany
+    batches, so 1M certificates is minutes, not hours. Every user shares one password
+    hash; returns {role: [user ids]} for the benchmark harness.
+    """
+    rng = random.Random(42)
+    password_hash = generate_password_hash(password, method=current_app.config['PASSWORD_HASH_METHOD'])
+    ids = {'admin': [], 'director': [], 'manager': [], 'employee': []}
+
+    def add_users(rows):
+        db.session.execute(insert(User), rows)
+        emails = [r['email'] for r in rows]
+        return list(db.session.scalars(select(User.id).where(User.email.in_(emails)).order_by(User.id)))
+
+    ids['admin'] = add_users([{"name": "Bench Admin", "email": "bench-admin@tcil.com",
+                               "role": "admin", "password_hash": password_hash}])
+    ids['director'] = add_users([
+        {"name": f"Director {d}", "email": f"director{d}@tcil.com", "role": "manager",
+         "password_hash": password_hash, "manager_id": ids['admin'][0]}
+        for d in range(directors)])
+    ids['manager'] = add_users([
+        {"name": f"Manager {d}.{m}", "email": f"manager{d}.{m}@tcil.com", "role": "manager",
+         "password_hash": password_hash, "manager_id": director}
+        for d, director in enumerate(ids['director']) for m in range(managers_per_director)])
+    ids['employee'] = add_users([
+        {"name": f"Employee {m}.{e}", "email": f"employee{m}.{e}@tcil.com", "role": "employee",
+         "password_hash": password_hash, "manager_id": manager}
+        for m, manager in enumerate(ids['manager']) for e in range(employees_per_manager)])
+    db.session.commit()
+    # Core inserts bypass the ORM flush hook that maintains the closure table
+    rebuild_closure()
+
+    start = datetime.utcnow() - timedelta(days=3 * 365)
+    for offset in range(0, certificates, batch_size):
+        count = min(batch_size, certificates - offset)
+        owners = [rng.choice(ids['employee']) for _ in range(count)]
+        stamps = [start + timedelta(minutes=rng.randrange(3 * 365 * 24 * 60)) for _ in range(count)]
+        uploads = db.session.execute(
+            insert(Upload).returning(Upload.id, sort_by_parameter_order=True),
+            [{"filename": f"bench-{offset + i}.pdf", "filepath": f"/api/files/bench-{offset + i}.pdf",
+              "storage_key": f"bench-{offset + i}.pdf", "user_id": owners[i], "timestamp": stamps[i]}
+             for i in range(count)]
+        ).scalars().all()
+        db.session.execute(insert(Certificate), [{
+            "upload_id": uploads[i],
+            "user_id": owners[i],
+            "title": f"Project {offset + i}",
+            "client": rng.choice(CLIENTS),
+            "nature_of_project": rng.choice(['Development', 'Consultancy', 'Supply', 'O&M']),
+            "technologies": ", ".join(rng.sample(TECHNOLOGIES, 2)),
+            "end_date": (stamps[i] + timedelta(days=rng.randrange(30, 1500))).date(),
+            "filename": f"/api/files/bench-{offset + i}.pdf",
+            "status": rng.choice(STATUSES),
+            "timestamp": stamps[i],
+        } for i in range(count)])
+        db.session.commit()
+    # Likewise for the dashboard summary counts, which record_created() keeps on the normal paths
+    rebuild_summary()
+    return ids
+
 if __name__ == "__main__":
-    seed_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Seed the CertFlow database")
+    parser.add_argument('--synthetic', type=int, metavar='N',
+                        help="also load a synthetic org chart with N certificates")
+    args = parser.parse_args()
+
+    app = create_app()
+    seed_data(app)
+    if args.synthetic:
+        with app.app_context():
+            seed_synthetic(certificates=args.synthetic)
+        print(f"✅ Loaded {args.synthetic} synthetic certificates.")
\ No newline at end of file
@@ -0,0 +1,290 @@
+import base64
+import os
+import tempfile
+import threading
+from functools import cached_property
+import requests
+from flask import current_app
+from metrics import track_io
+
+# Supabase's resumable (TUS) endpoint only accepts 6 MB chunks, so every backend uses it
+CHUNK_SIZE = 6 * 1024 * 1024
+MAX_CHUNK_RETRIES = 3
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def iter_chunks(stream, chunk_size=CHUNK_SIZE, max_size=None):
+    """Reads a file-like object in fixed-size chunks, aborting once max_size is exceeded"""
+    total = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        total += len(chunk)
+        if max_size and total > max_size:
+            raise UploadTooLarge(f"File exceeds the {max_size // (1024 * 1024)} MB limit")
+        yield chunk
+
+
+class StorageBackend:
+    """
+    Interface every storage backend implements. Keys are flat object names
+    (e.g. "3f9a1c2b7d4e.pdf"); url() is what gets persisted on Upload/Certificate rows.
+    """
+
+    def put_stream(self, key, chunks, content_type="application/pdf"):
+        raise NotImplementedError
+
+    def put(self, key, data, content_type="application/pdf"):
+        self.put_stream(key, iter([data]), content_type)
+
+    def stream(self, key, chunk_size=CHUNK_SIZE):
+        raise NotImplementedError
+
+    def get(self, key):
+        return b"".join(self.stream(key))
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def url(self, key):
+        raise NotImplementedError
+
+    def size(self, key):
+        """Object size in bytes, or None if it does not exist"""
+        raise NotImplementedError
+
+    def read_prefix(self, key, length):
+        return next(self.stream(key, length), b"")[:length]
+
+    def presign_upload(self, key, content_type="application/pdf"):
+        """
+        Returns {"url", "headers"} for a client to PUT the object directly, or None
+        when the backend has no signing of its own and uploads go through the API.
+        """
+        return None
+
+    def key_from_url(self, url):
+        """Recovers the object key from a stored URL"""
+        return url.rsplit('/', 1)[-1]
+
+
+def _tus_metadata(**values):
+    return ",".join(f"{k} {base64.b64encode(v.encode()).decode()}" for k, v in values.items())
+
+
+class SupabaseStorage(StorageBackend):
+    """Streams objects into a Supabase bucket through its resumable (TUS) upload API"""
+
+    def __init__(self, url, key, bucket="certificates"):
+        self.base_url = url.rstrip('/')
+        self.bucket = bucket
+        self._key = key
+        self.http = requests.Session()
+        self.http.headers.update({"authorization": f"Bearer {key}", "apikey": key})
+
+    @cached_property
+    def client(self):
+        # The SDK is slow to import and only deletes need it, so it loads on first use, not at boot
+        from supabase import create_client
+        return create_client(self.base_url, self._key)
+
+    def put_stream(self, key, chunks, content_type="application/pdf"):
+        with track_io('supabase'):
+            self._put_stream(key, chunks, content_type)
+
+    def _put_stream(self, key, chunks, content_type):
+        # Upsert: keys are content hashes, so rewriting one stores the same bytes again
+        first = next(chunks, b"")
+        second = next(chunks, None)
+        if second is None:
+            # Fits in one chunk: a plain object PUT is one round-trip instead of three
+            res = self.http.post(
+                f"{self.base_url}/storage/v1/object/{self.bucket}/{key}",
+                data=first,
+                headers={"content-type": content_type, "x-upsert": "true"},
+            )
+            res.raise_for_status()
+            return
+
+        res = self.http.post(
+            f"{self.base_url}/storage/v1/upload/resumable",
+            headers={
+                "Tus-Resumable": "1.0.0",
+                "Upload-Defer-Length": "1",
+                "Upload-Metadata": _tus_metadata(bucketName=self.bucket, objectName=key, contentType=content_type),
+                "x-upsert": "true",
+            },
+        )
+        res.raise_for_status()
+        location = res.headers["Location"]
+
+        offset = 0
+        pending = [first, second]
+        while pending:
+            chunk = pending.pop(0)
+            nxt = next(chunks, None)
+            if nxt is not None:
+                pending.append(nxt)
+            # The total length is only known once the last chunk has been read
+            final_length = None if pending else offset + len(chunk)
+            offset = self._patch_chunk(location, offset, chunk, final_length)
+
+    def _patch_chunk(self, location, offset, chunk, final_length):
+        """Sends one chunk, resuming from the server's offset after a dropped connection"""
+        sent_from = offset
+        for attempt in range(MAX_CHUNK_RETRIES):
+            headers = {
+                "Tus-Resumable": "1.0.0",
+                "Upload-Offset": str(sent_from),
+                "Content-Type": "application/offset+octet-stream",
+            }
+            if final_length is not None:
+                headers["Upload-Length"] = str(final_length)
+            try:
+                res = self.http.patch(location, data=chunk[sent_from - offset:], headers=headers)
+                res.raise_for_status()
+                return int(res.headers["Upload-Offset"])
+            except requests.RequestException:
+                if attempt == MAX_CHUNK_RETRIES - 1:
+                    raise
+                head = self.http.head(location, headers={"Tus-Resumable": "1.0.0"})
+                head.raise_for_status()
+                sent_from = int(head.headers["Upload-Offset"])
+
+    def stream(self, key, chunk_size=CHUNK_SIZE):
+        with track_io('supabase'):
+            res = self.http.get(f"{self.base_url}/storage/v1/object/{self.bucket}/{key}", stream=True)
+            res.raise_for_status()
+        with res:
+            yield from res.iter_content(chunk_size)
+
+    def delete(self, key):
+        with track_io('supabase'):
+            self.client.storage.from_(self.bucket).remove([key])
+
+    def size(self, key):
+        with track_io('supabase'):
+            res = self.http.head(f"{self.base_url}/storage/v1/object/{self.bucket}/{key}")
+        if res.status_code in (400, 404):
+            return None
+        res.raise_for_status()
+        return int(res.headers.get("Content-Length", 0))
+
+    def presign_upload(self, key, content_type="application/pdf"):
+        with track_io('supabase'):
+            res = self.http.post(f"{self.base_url}/storage/v1/object/upload/sign/{self.bucket}/{key}")
+        res.raise_for_status()
+        return {
+            "url": f"{self.base_url}/storage/v1{res.json()['url']}",
+            "headers": {"content-type": content_type},
+        }
+
+    def url(self, key):
+        return f"{self.base_url}/storage/v1/object/public/{self.bucket}/{key}"
+
+
+class LocalStorage(StorageBackend):
+    """
+    Writes objects under a directory for on-prem or offline use. Objects are
+    sharded two levels deep by key prefix so no single directory grows unbounded,
+    and written to a temp file first so readers never see a partial object.
+    """
+
+    def __init__(self, root, base_url="/api/files"):
+        self.root = root
+        self.base_url = base_url.rstrip('/')
+
+    def path(self, key):
+        key = os.path.basename(key)
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def put_stream(self, key, chunks, content_type="application/pdf"):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for chunk in chunks:
+                    out.write(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def stream(self, key, chunk_size=CHUNK_SIZE):
+        with open(self.path(key), "rb") as f:
+            yield from iter_chunks(f, chunk_size)
+
+    def delete(self, key):
+        try:
+            os.unlink(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def size(self, key):
+        try:
+            return os.path.getsize(self.path(key))
+        except FileNotFoundError:
+            return None
+
+    def url(self, key):
+        return f"{self.base_url}/{key}"
+
+
+class MemoryStorage(StorageBackend):
+    """Keeps objects in a dict; for tests and benchmarks that must not touch disk or network"""
+
+    def __init__(self, base_url="/api/files"):
+        self.base_url = base_url.rstrip('/')
+        self.objects = {}
+        self._lock = threading.Lock()
+
+    def put_stream(self, key, chunks, content_type="application/pdf"):
+        data = b"".join(chunks)
+        with self._lock:
+            self.objects[key] = (data, content_type)
+
+    def stream(self, key, chunk_size=CHUNK_SIZE):
+        data = self.objects[key][0]
+        for i in range(0, len(data), chunk_size):
+            yield data[i:i + chunk_size]
+
+    def get(self, key):
+        return self.objects[key][0]
+
+    def content_type(self, key):
+        return self.objects[key][1]
+
+    def delete(self, key):
+        with self._lock:
+            self.objects.pop(key, None)
+
+    def size(self, key):
+        item = self.objects.get(key)
+        return len(item[0]) if item else None
+
+    def url(self, key):
+        return f"{self.base_url}/{key}"
+
+
+def create_storage(config):
+    backend = config['STORAGE_BACKEND']
+    if backend == 'local':
+        return LocalStorage(config['UPLOAD_FOLDER'])
+    if backend == 'memory':
+        return MemoryStorage()
+    if backend == 'supabase':
+        return SupabaseStorage(config['SUPABASE_URL'], config['SUPABASE_SERVICE_ROLE_KEY'])
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+
+
+def get_storage():
+    """Returns the current app's backend (selected by STORAGE_BACKEND), built on first use"""
+    app = current_app._get_current_object()
+    if 'storage' not in app.extensions:
+        app.extensions['storage'] = create_storage(app.config)
+    return app.extensions['storage']
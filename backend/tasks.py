@@ -0,0 +1,62 @@
+from flask_mail import Message
+from extensions import mail
+from jobs import jobs
+from storage import get_storage
+from blobs import is_referenced, dedupe_upload as dedupe_stored_upload
+from metrics import track_io
+from expiry import send_expiry_reminders
+from derivatives import generate_derivatives
+
+
+@jobs.task('send_email')
+def send_email(to, subject, html):
+    msg = Message(subject=subject, recipients=[to], html=html)
+    with track_io('smtp'):
+        mail.send(msg)
+
+
+@jobs.task('send_emails')
+def send_emails(messages):
+    """
+    Sends a batch of {to, subject, html} messages over a single SMTP connection.
+    If it fails part-way, the unsent messages become separate send_email jobs with
+    their own retries, instead of retrying the batch and resending delivered mail.
+    """
+    sent = 0
+    try:
+        with track_io('smtp'), mail.connect() as conn:
+            for m in messages:
+                conn.send(Message(subject=m['subject'], recipients=[m['to']], html=m['html']))
+                sent += 1
+    except Exception as e:
+        print(f"Batch mail failed after {sent} of {len(messages)} messages, retrying the rest one by one: {e}")
+        for m in messages[sent:]:
+            jobs.offer('send_email', **m)
+
+
+@jobs.task('delete_object')
+def delete_object(key):
+    # A new upload of the same content may have re-referenced the object since it was queued
+    if is_referenced(key):
+        return
+    get_storage().delete(key)
+
+
+@jobs.task('dedupe_upload')
+def dedupe_upload(upload_id):
+    duplicate = dedupe_stored_upload(upload_id)
+    if duplicate:
+        jobs.offer('delete_object', key=duplicate)
+
+
+@jobs.task('pdf_derivatives')
+def pdf_derivatives(upload_ids):
+    generate_derivatives(upload_ids)
+
+
+@jobs.task('expiry_reminders')
+def expiry_reminders():
+    send_expiry_reminders()
+
+
+jobs.every('EXPIRY_CHECK_INTERVAL', 'expiry_reminders')
@@ -0,0 +1,51 @@
+import os
+import sys
+
+# The backend imports its modules by flat name (`from extensions import db`)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Read by config.py at import time, so set before the app is imported
+os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret-key-that-is-long-enough-for-hs256")
+# No background workers or timers: queued jobs stay queued and tests run tasks directly
+os.environ["JOB_WORKERS"] = "0"
+os.environ["EXPIRY_CHECK_INTERVAL"] = "0"
+
+import pytest
+from app import create_app
+from decorators import user_cache
+from extensions import db as _db
+from migrations import upgrade
+from models import User
+from storage import get_storage
+
+
+@pytest.fixture
+def app():
+    app = create_app()
+    # Every test starts from an empty database, so ids cached by an earlier test are stale
+    user_cache.clear()
+    with app.app_context():
+        upgrade()
+        yield app
+        _db.session.remove()
+
+
+@pytest.fixture
+def db(app):
+    return _db
+
+
+@pytest.fixture
+def storage(app):
+    return get_storage()
+
+
+@pytest.fixture
+def user(db):
+    user = User(name="Employee", email="employee@example.com", role="employee")
+    user.set_password("password")
+    db.session.add(user)
+    db.session.commit()
+    return user
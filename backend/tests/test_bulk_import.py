@@ -0,0 +1,104 @@
+import csv
+import hashlib
+import io
+import zipfile
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import select
+import bulk_import
+from jobs import jobs
+from models import Blob, Certificate, Upload
+
+SHARED = b"%PDF-1.7 shared"
+KNOWN = b"%PDF-1.7 already stored"
+ORPHAN = b"%PDF-1.7 only used by a failing row"
+
+
+def digest(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def manifest(rows):
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=["title", "client", "file", "owner_email"])
+    writer.writeheader()
+    writer.writerows(rows)
+    return io.BytesIO(out.getvalue().encode()), "manifest.csv"
+
+
+def archive(files):
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w") as zf:
+        for name, content in files.items():
+            zf.writestr(name, content)
+    out.seek(0)
+    return out, "files.zip"
+
+
+@pytest.fixture
+def headers(user):
+    return {"Authorization": "Bearer " + create_access_token(identity={"id": user.id, "role": user.role})}
+
+
+@pytest.fixture
+def failing_insert(monkeypatch):
+    # Stands in for a row the database rejects, so the batch has to be retried row by row
+    insert_batch = bulk_import._insert_batch
+
+    def insert_or_fail(batch, storage):
+        if any(row["title"] == "rejected by db" for _, row, *_ in batch):
+            raise ValueError("constraint violated")
+        return insert_batch(batch, storage)
+    monkeypatch.setattr(bulk_import, "_insert_batch", insert_or_fail)
+
+
+def test_mixed_batch_commits_good_rows_and_reports_bad_ones(app, db, user, headers, failing_insert):
+    db.session.add(Blob(sha256=digest(KNOWN), storage_key="known.pdf", size=len(KNOWN), refcount=1))
+    db.session.commit()
+
+    rows = [
+        {"title": "a", "client": "c", "file": "a.pdf"},
+        {"title": "b", "client": "c", "file": "copy-of-a.pdf"},
+        {"title": "no client", "client": "", "file": "a.pdf"},
+        {"title": "missing", "client": "c", "file": "missing.pdf"},
+        {"title": "text", "client": "c", "file": "notes.txt"},
+        {"title": "foreign", "client": "c", "file": "a.pdf", "owner_email": "someone@example.com"},
+        {"title": "known", "client": "c", "file": "known.pdf"},
+        {"title": "rejected by db", "client": "c", "file": "orphan.pdf"},
+    ]
+    files = {"a.pdf": SHARED, "copy-of-a.pdf": SHARED, "notes.txt": b"text",
+             "known.pdf": KNOWN, "orphan.pdf": ORPHAN}
+    res = app.test_client().post("/api/certificates/bulk", headers=headers,
+                                 data={"manifest": manifest(rows), "archive": archive(files)},
+                                 content_type="multipart/form-data")
+
+    assert res.status_code == 200
+    assert [r["row"] for r in res.json["imported"]] == [1, 2, 7]
+    failed = {f["row"]: f["error"] for f in res.json["failed"]}
+    assert sorted(failed) == [3, 4, 5, 6, 8]
+    assert "required" in failed[3]
+    assert "not found" in failed[4]
+    assert "Unsupported" in failed[5]
+    assert "someone@example.com" in failed[6]
+    assert "Database insert failed" in failed[8]
+
+    db.session.expire_all()
+    titles = db.session.scalars(select(Certificate.title).order_by(Certificate.id)).all()
+    assert titles == ["a", "b", "known"]
+    assert db.session.scalar(select(Upload.id).where(Upload.sha256 == digest(ORPHAN))) is None
+
+    refcounts = dict(db.session.execute(select(Blob.sha256, Blob.refcount)).all())
+    assert refcounts == {digest(SHARED): 2, digest(KNOWN): 2}
+
+    # The orphan's content was written but nothing references it, so it is queued for deletion
+    queued = [(name, payload) for _, name, payload, *_ in list(jobs._queue.queue)]
+    assert ("delete_object", {"key": bulk_import.content_key(digest(ORPHAN), "orphan.pdf")}) in queued
+
+
+def test_unreadable_manifest_is_rejected(app, headers):
+    res = app.test_client().post("/api/certificates/bulk", headers=headers,
+                                 data={"manifest": (io.BytesIO(b"{"), "rows.json"),
+                                       "archive": archive({"a.pdf": SHARED})},
+                                 content_type="multipart/form-data")
+    assert res.status_code == 400
+    assert "Unreadable manifest" in res.json["message"]
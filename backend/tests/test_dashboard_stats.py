@@ -0,0 +1,27 @@
+from datetime import datetime
+from flask_jwt_extended import create_access_token
+from sqlalchemy import insert
+from models import Upload, Certificate
+
+
+def test_stats_follow_writes_this_process_did_not_see(app, db, user):
+    client = app.test_client()
+    headers = {"Authorization": "Bearer " + create_access_token(identity={"id": user.id, "role": user.role})}
+    first = client.get("/api/dashboard/stats", headers=headers)
+    assert first.json["total_uploads"] == 0
+
+    # As another worker would: nothing pops this process's stats cache, only the versions move
+    up = Upload(filename="a.pdf", filepath="/api/files/a.pdf", user_id=user.id)
+    db.session.add(up)
+    db.session.flush()
+    db.session.execute(insert(Certificate).values(
+        title="t", client="c", filename=up.filepath, user_id=user.id, upload_id=up.id,
+        status='pending', timestamp=datetime.utcnow()))
+    db.session.commit()
+
+    second = client.get("/api/dashboard/stats", headers={**headers, "If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 200
+    assert second.json["total_uploads"] == 1
+
+    third = client.get("/api/dashboard/stats", headers={**headers, "If-None-Match": second.headers["ETag"]})
+    assert third.status_code == 304
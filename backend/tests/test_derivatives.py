@@ -0,0 +1,73 @@
+import hashlib
+import pytest
+import derivatives
+from derivatives import generate_derivatives
+from models import Upload, Derivative
+
+fitz = pytest.importorskip("fitz")
+
+
+def make_pdf(text):
+    with fitz.open() as doc:
+        doc.new_page(width=200, height=200).insert_text((20, 50), text)
+        return doc.tobytes()
+
+def add_upload(db, storage, user, data, key, filename="certificate.pdf"):
+    storage.put(key, data)
+    up = Upload(filename=filename, filepath=storage.url(key), storage_key=key, user_id=user.id,
+                sha256=hashlib.sha256(data).hexdigest())
+    db.session.add(up)
+    db.session.commit()
+    return up
+
+
+def test_renders_thumbnail_and_text(db, storage, user):
+    up = add_upload(db, storage, user, make_pdf("Completion certificate"), "a.pdf")
+
+    generate_derivatives([up.id])
+
+    derivative = db.session.get(Derivative, up.id)
+    assert derivative.status == 'ready'
+    assert derivative.page_count == 1
+    assert "Completion certificate" in derivative.text
+    assert storage.get(derivative.thumbnail_key).startswith(b"\x89PNG")
+
+
+def test_same_content_is_copied_not_rendered(db, storage, user, monkeypatch):
+    data = make_pdf("Shared content")
+    first = add_upload(db, storage, user, data, "first.pdf")
+    second = add_upload(db, storage, user, data, "second.pdf")
+    generate_derivatives([first.id])
+
+    def render_pdf(*args):
+        raise AssertionError("content with derivatives must not be rendered again")
+    monkeypatch.setattr(derivatives, "render_pdf", render_pdf)
+    generate_derivatives([second.id])
+
+    original, copy = db.session.get(Derivative, first.id), db.session.get(Derivative, second.id)
+    assert copy.status == 'ready'
+    assert (copy.text, copy.page_count) == (original.text, original.page_count)
+    # Each upload owns its thumbnail object, so deleting one leaves the other intact
+    assert copy.thumbnail_key != original.thumbnail_key
+    assert storage.get(copy.thumbnail_key) == storage.get(original.thumbnail_key)
+
+
+def test_unreadable_pdf_is_marked_failed(db, storage, user):
+    up = add_upload(db, storage, user, b"%PDF-1.7 truncated", "broken.pdf")
+
+    generate_derivatives([up.id])
+
+    derivative = db.session.get(Derivative, up.id)
+    assert derivative.status == 'failed'
+    assert derivative.error
+    assert derivative.thumbnail_key is None
+
+
+def test_retry_skips_uploads_that_have_a_derivative(db, storage, user):
+    up = add_upload(db, storage, user, b"not a pdf", "notes.txt", filename="notes.txt")
+
+    generate_derivatives([up.id])
+    generate_derivatives([up.id])
+
+    assert db.session.query(Derivative).filter_by(upload_id=up.id).count() == 1
+    assert db.session.get(Derivative, up.id).status == 'unsupported'
@@ -0,0 +1,40 @@
+import pytest
+from flask_jwt_extended import create_access_token
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def headers(user):
+    return {"Authorization": "Bearer " + create_access_token(identity={"id": user.id, "role": user.role})}
+
+def presign(client, headers):
+    response = client.post("/api/uploads/presign", json={"filename": "a.pdf", "size": 13}, headers=headers)
+    assert response.status_code == 201
+    return response.json
+
+def put(client, target, headers):
+    path = target["upload_url"].split("://", 1)[-1].split("/", 1)[-1]
+    return client.put("/" + path, data=b"%PDF-1.7 body", headers=headers)
+
+
+def test_upload_token_travels_in_a_header_not_the_url(client, headers):
+    target = presign(client, headers)
+
+    assert "token" not in target["upload_url"]
+    assert put(client, target, target["headers"]).status_code == 204
+    finalized = client.post(f"/api/uploads/{target['upload_id']}/finalize",
+                            json={"title": "t", "client": "c"}, headers=headers)
+    assert finalized.status_code == 201
+
+
+def test_blob_endpoint_rejects_missing_and_foreign_tokens(client, headers):
+    first, second = presign(client, headers), presign(client, headers)
+
+    assert put(client, first, {"content-type": "application/pdf"}).status_code == 401
+    # A token only opens the upload it was issued for
+    assert put(client, first, second["headers"]).status_code == 401
+    # Nor does a session token
+    assert put(client, first, {"x-upload-token": headers["Authorization"].split()[1]}).status_code == 401
@@ -0,0 +1,34 @@
+from datetime import date, timedelta
+import pytest
+from jobs import jobs, QueueFull
+from expiry import send_expiry_reminders
+from models import Upload, TCILCertificate, ExpiryNotice
+
+
+@pytest.fixture
+def expiring(db, user):
+    up = Upload(filename="tcil.pdf", filepath="/api/files/tcil.pdf", user_id=user.id)
+    db.session.add(up)
+    db.session.flush()
+    db.session.add(TCILCertificate(name="ISO 27001", valid_from=date.today() - timedelta(days=300),
+                                   valid_till=date.today() + timedelta(days=5), pdf_path=up.filepath, upload_id=up.id))
+    db.session.commit()
+
+
+def test_reminders_are_claimed_once(db, expiring):
+    assert send_expiry_reminders() == {"items": 1, "emails": 1}
+    assert send_expiry_reminders() == {"items": 0, "emails": 0}
+    assert db.session.query(ExpiryNotice).count() == 1
+
+
+def test_full_queue_leaves_the_reminder_unclaimed(db, expiring, monkeypatch):
+    def full(name, **payload):
+        raise QueueFull("full")
+    monkeypatch.setattr(jobs, "enqueue", full)
+
+    with pytest.raises(QueueFull):
+        send_expiry_reminders()
+    assert db.session.query(ExpiryNotice).count() == 0
+
+    monkeypatch.undo()
+    assert send_expiry_reminders() == {"items": 1, "emails": 1}
@@ -0,0 +1,46 @@
+from datetime import timedelta
+import pytest
+from flask_jwt_extended import create_access_token
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def headers(user):
+    return {"Authorization": "Bearer " + create_access_token(identity={"id": user.id, "role": user.role})}
+
+def reset(client, token, password="new-password"):
+    return client.post(f"/api/auth/reset-password/{token}", json={"password": password})
+
+def login(client, password):
+    return client.post("/api/auth/login", json={"email": "employee@example.com", "password": password})
+
+
+def test_reset_link_changes_the_password(client, user):
+    token = create_access_token(identity=str(user.id), expires_delta=timedelta(hours=1),
+                                additional_claims={"type": "password_reset"})
+
+    assert reset(client, token).status_code == 200
+    assert login(client, "new-password").status_code == 200
+
+
+def test_events_token_cannot_reset_the_password(client, user, headers):
+    token = client.post("/api/events/token", headers=headers).json["token"]
+
+    assert reset(client, token).status_code == 400
+    assert login(client, "new-password").status_code == 401
+
+
+def test_upload_token_cannot_reset_the_password(client, user, headers):
+    target = client.post("/api/uploads/presign", json={"filename": "a.pdf", "size": 10}, headers=headers).json
+    token = target["headers"]["x-upload-token"]
+
+    assert reset(client, token).status_code == 400
+    assert login(client, "new-password").status_code == 401
+
+
+def test_session_token_and_garbage_are_rejected(client, user, headers):
+    assert reset(client, headers["Authorization"].split()[1]).status_code == 400
+    assert reset(client, "not-a-token").status_code == 400
@@ -0,0 +1,48 @@
+import pytest
+from flask_jwt_extended import create_access_token
+from config import Config
+from metrics import profiler, registry
+from models import User
+
+
+@pytest.fixture
+def metrics_enabled(monkeypatch):
+    # The admin profile routes only exist when metrics are switched on
+    monkeypatch.setattr(Config, "METRICS_ENABLED", True)
+    monkeypatch.setattr(registry, "enabled", False)
+    monkeypatch.setattr(registry, "collectors", [])
+
+
+@pytest.fixture
+def app(metrics_enabled, app):
+    # Wraps the conftest app; metrics_enabled is listed first so it runs before create_app()
+    return app
+
+
+@pytest.fixture
+def admin_headers(db):
+    admin = User(name="Admin", email="admin@example.com", role="admin")
+    admin.set_password("password")
+    db.session.add(admin)
+    db.session.commit()
+    return {"Authorization": "Bearer " + create_access_token(identity={"id": admin.id, "role": admin.role})}
+
+
+@pytest.mark.parametrize("interval", ["fast", None, 0, -1, 0.0001, "nan", 5])
+def test_bad_interval_is_rejected(app, admin_headers, interval):
+    res = app.test_client().post("/api/admin/profile", headers=admin_headers,
+                                 json={"endpoint": "metrics.scrape", "interval": interval})
+    assert res.status_code == 400
+    assert profiler.endpoint is None
+
+
+@pytest.mark.parametrize("top", ["ten", "1.5", "0", "-3"])
+def test_bad_top_is_rejected(app, admin_headers, top):
+    res = app.test_client().get(f"/api/admin/profile?top={top}", headers=admin_headers)
+    assert res.status_code == 400
+
+
+def test_report_defaults_top(app, admin_headers):
+    res = app.test_client().get("/api/admin/profile", headers=admin_headers)
+    assert res.status_code == 200
+    assert res.mimetype == "text/plain"
@@ -0,0 +1,73 @@
+from datetime import datetime, date, timedelta
+import pytest
+from sqlalchemy import select, func, insert, text
+from hierarchy import team_ids, rebuild_closure
+from models import User, Upload, Certificate, TCILCertificate
+
+NEWEST_FIRST = (Certificate.timestamp.desc(), Certificate.id.desc())
+
+# (query, index it must be served by)
+HOT_QUERIES = {
+    "admin listing": (
+        lambda: select(Certificate.id).order_by(*NEWEST_FIRST).limit(51),
+        "ix_certificates_timestamp_id"),
+    "employee listing": (
+        lambda: select(Certificate.id).where(Certificate.user_id == 2).order_by(*NEWEST_FIRST).limit(51),
+        "ix_certificates_user_timestamp"),
+    "status listing": (
+        lambda: select(Certificate.id).where(Certificate.status == 'pending').order_by(*NEWEST_FIRST).limit(51),
+        "ix_certificates_status_timestamp"),
+    "employee stats": (
+        lambda: select(Certificate.status, func.count()).where(Certificate.user_id == 2).group_by(Certificate.status),
+        "ix_certificates_user_status"),
+    "manager stats": (
+        lambda: select(Certificate.status, func.count()).where(Certificate.user_id.in_(team_ids(1)))
+        .group_by(Certificate.status),
+        "ix_certificates_user_status"),
+    "tcil expiry": (
+        lambda: select(TCILCertificate.id).where(TCILCertificate.valid_till <= date(2026, 1, 31)),
+        "ix_tcil_certificates_valid_till"),
+    "certificate expiry": (
+        lambda: select(Certificate.id).where(Certificate.end_date.between(date(2026, 1, 1), date(2026, 1, 31))),
+        "ix_certificates_end_date"),
+}
+
+
+@pytest.fixture
+def seeded(db):
+    """20 employees (two of them reporting to manager 1) with 5,000 certificates"""
+    db.session.execute(insert(User), [{"id": 1, "name": "m", "email": "m@example.com", "password_hash": "x",
+                                       "role": "manager"}] +
+                       [{"id": i, "name": f"e{i}", "email": f"e{i}@example.com", "password_hash": "x",
+                         "role": "employee", "manager_id": 1 if i < 4 else None} for i in range(2, 22)])
+    db.session.execute(insert(Upload), [{"id": i, "filename": "f.pdf", "user_id": 2 + i % 20}
+                                        for i in range(1, 5001)])
+    start = datetime(2024, 1, 1)
+    db.session.execute(insert(Certificate), [{
+        "upload_id": i, "user_id": 2 + i % 20, "title": "t", "client": f"c{i % 50}", "filename": "f.pdf",
+        "status": ('pending', 'approved', 'rejected')[i % 3], "timestamp": start + timedelta(hours=i),
+        "end_date": date(2025, 1, 1) + timedelta(days=i % 700),
+    } for i in range(1, 5001)])
+    db.session.execute(insert(TCILCertificate), [{
+        "name": f"tcil {i}", "valid_from": date(2024, 1, 1), "valid_till": date(2025, 1, 1) + timedelta(days=i),
+        "pdf_path": "f.pdf",
+    } for i in range(1, 1001)])
+    db.session.commit()
+    rebuild_closure()
+
+
+def query_plan(db, stmt):
+    sql = str(stmt.compile(dialect=db.engine.dialect, compile_kwargs={"literal_binds": True}))
+    with db.engine.begin() as conn:
+        if db.engine.dialect.name == 'sqlite':
+            return "\n".join(row.detail for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+        # Tiny test tables make a sequential scan the cheapest plan whatever the indexes
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        return "\n".join(row[0] for row in conn.execute(text(f"EXPLAIN {sql}")))
+
+
+@pytest.mark.parametrize("name", HOT_QUERIES)
+def test_hot_query_uses_its_index(db, seeded, name):
+    build, index = HOT_QUERIES[name]
+    plan = query_plan(db, build())
+    assert index in plan, f"{name} is not served by {index}:\n{plan}"
@@ -0,0 +1,18 @@
+from sqlalchemy import select, func
+from models import Certificate, CertificateSummary
+from seed import seed_synthetic
+
+
+def test_synthetic_certificates_are_counted_in_the_summary(db):
+    seed_synthetic(directors=1, managers_per_director=1, employees_per_manager=3,
+                   certificates=120, batch_size=50)
+
+    for dimension in ('status', 'client', 'month'):
+        counted = db.session.scalar(select(func.sum(CertificateSummary.count))
+                                    .where(CertificateSummary.dimension == dimension))
+        assert counted == 120
+    per_user = dict(db.session.execute(select(Certificate.user_id, func.count()).group_by(Certificate.user_id)).all())
+    summary = dict(db.session.execute(
+        select(CertificateSummary.user_id, func.sum(CertificateSummary.count))
+        .where(CertificateSummary.dimension == 'status').group_by(CertificateSummary.user_id)).all())
+    assert summary == per_user
@@ -0,0 +1,53 @@
+from datetime import date
+from contextlib import contextmanager
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from models import Upload, TCILCertificate, Derivative
+
+
+def seed_tcil(db, user, count):
+    for i in range(count):
+        up = Upload(filename=f"tcil-{i}.pdf", filepath=f"/api/files/tcil-{i}.pdf", user_id=user.id)
+        db.session.add(up)
+        db.session.flush()
+        db.session.add(TCILCertificate(name=f"Certificate {i}", valid_from=date(2025, 1, 1),
+                                       valid_till=date(2027, 1, 1), pdf_path=up.filepath, upload_id=up.id))
+        if i % 2:
+            db.session.add(Derivative(upload_id=up.id, status='ready', thumbnail_key=f"thumb-{i}.png"))
+    db.session.commit()
+
+@contextmanager
+def count_statements(engine):
+    statements = []
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+def listing_statements(client, db, headers):
+    with count_statements(db.engine) as statements:
+        response = client.get("/api/tcil/certificates?limit=100", headers=headers)
+    assert response.status_code == 200
+    return len(response.json["certificates"]), len(statements)
+
+
+def test_tcil_listing_query_count_does_not_grow_with_rows(app, db, user):
+    client = app.test_client()
+    headers = {"Authorization": "Bearer " + create_access_token(identity={"id": user.id, "role": user.role})}
+
+    # Warms the per-process user cache so both measurements see the same lookups
+    listing_statements(client, db, headers)
+
+    seed_tcil(db, user, 5)
+    rows, small = listing_statements(client, db, headers)
+    assert rows == 5
+
+    seed_tcil(db, user, 45)
+    rows, large = listing_statements(client, db, headers)
+    assert rows == 50
+
+    # Uploader names and thumbnails come from the same joined query, not one lookup per row
+    assert large == small
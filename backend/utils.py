@@ -0,0 +1,39 @@
+import os
+import uuid
+from datetime import datetime
+
+
+def allowed_file(filename):
+    ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg'}
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+def parse_date(date_str):
+    if not date_str: return None
+    for fmt in ('%Y-%m-%d', '%d-%m-%Y'):
+        try: return datetime.strptime(date_str, fmt).date()
+        except: continue
+    return None
+
+def new_storage_key(filename):
+    ext = os.path.splitext(filename)[1].lower()
+    # Unique name prevents overwriting files with the same name
+    return f"{uuid.uuid4().hex[:12]}{ext}"
+
+def certificate_values(fields, user_id, upload_id, filepath):
+    """Column values for a new pending Certificate from submitted form/JSON/manifest fields"""
+    return dict(
+        title=fields.get('title'),
+        client=fields.get('client'),
+        nature_of_project=fields.get('nature_of_project'),
+        sub_nature_of_project=fields.get('sub_nature_of_project'),
+        start_date=parse_date(fields.get('start_date')),
+        go_live_date=parse_date(fields.get('go_live_date')),
+        end_date=parse_date(fields.get('end_date')),
+        value=fields.get('value'),
+        technologies=fields.get('technologies'),
+        status='pending',
+        filename=filepath,
+        user_id=user_id,
+        upload_id=upload_id,
+        timestamp=datetime.utcnow()
+    )
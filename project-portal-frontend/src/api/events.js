@@ -0,0 +1,35 @@
+import api from './axios';
+
+// Subscribes to the server-sent event stream. EventSource cannot send an
+// Authorization header, so each connection first fetches a short-lived stream
+// token. When the server closes the stream or the token expires we reconnect
+// with a fresh one. Returns a function that closes the subscription.
+export function subscribeToEvents(handlers) {
+  let source = null;
+  let retryTimer = null;
+  let closed = false;
+
+  const connect = async () => {
+    try {
+      const { data } = await api.post('/events/token');
+      if (closed) return;
+      source = new EventSource(`${api.defaults.baseURL}/events/stream?token=${encodeURIComponent(data.token)}`);
+      Object.entries(handlers).forEach(([type, handler]) =>
+        source.addEventListener(type, (e) => handler(JSON.parse(e.data)))
+      );
+      source.onerror = () => {
+        source.close();
+        if (!closed) retryTimer = setTimeout(connect, 3000);
+      };
+    } catch (err) {
+      if (!closed) retryTimer = setTimeout(connect, 30000);
+    }
+  };
+
+  connect();
+  return () => {
+    closed = true;
+    clearTimeout(retryTimer);
+    if (source) source.close();
+  };
+}
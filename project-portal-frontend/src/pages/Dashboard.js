@@ -1,7 +1,7 @@
 import React, { useEffect, useState } from 'react';
 import { Link } from 'react-router-dom';
 import api from '../api/axios';
-import * as XLSX from 'xlsx';
+import { subscribeToEvents } from '../api/events';
 import '../styles/dashboard.css';
 
 
@@ -13,19 +13,24 @@ function Dashboard() {
   const [message, setMessage] = useState('');
   const [searchTerm, setSearchTerm] = useState('');
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [refreshKey, setRefreshKey] = useState(0);
+  const [expiring, setExpiring] = useState(null);
+
+  // Searches run on the server (ranked, scoped to the user); otherwise page the full listing.
+  // The status filter is applied there too, so every page (and the export) honours it.
+  const query = searchTerm.trim();
+  const listRoute = query ? '/certificates/search' : '/certificates/all';
+  const statusParams = filterStatus === 'all' ? {} : { status: filterStatus };
+  const listParams = query ? { q: query, ...statusParams } : statusParams;
 
   useEffect(() => {
     const fetchCertificates = async () => {
       try {
         setLoading(true);
-        // Admins and Managers use the 'all' route; Employees use their own.
-        const route = '/certificates/all';
-          
-        const certsRes = await api.get(route);
-        const certList = Array.isArray(certsRes.data) ? certsRes.data : [];
-        setCertificates(certList);
-
-        setCertificates(certList);
+        const certsRes = await api.get(listRoute, { params: listParams });
+        setCertificates(certsRes.data.certificates || []);
+        setNextCursor(certsRes.data.next_cursor);
       } catch (err) {
         console.error('Error fetching certificates:', err);
         setMessage('❌ Failed to load certificates.');
@@ -34,9 +39,40 @@ function Dashboard() {
       }
     };
 
-    if (role) fetchCertificates();
+    if (!role) return;
+    // Debounce typing so each keystroke does not hit the API
+    const timer = setTimeout(fetchCertificates, query ? 300 : 0);
+    return () => clearTimeout(timer);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [role, query, filterStatus, refreshKey]);
+
+  useEffect(() => {
+    if (!role) return;
+    api.get('/expiring', { params: { limit: 5 } })
+      .then(res => setExpiring(res.data))
+      .catch(() => setExpiring(null));
+  }, [role]);
+
+  // Pushed changes replace polling: patch statuses in place, reload on new uploads
+  useEffect(() => {
+    if (!role) return;
+    return subscribeToEvents({
+      'certificate.status': ({ ids, status }) =>
+        setCertificates(prev => prev.map(cert => ids.includes(cert.id) ? { ...cert, status } : cert)),
+      'certificate.created': () => setRefreshKey(k => k + 1),
+    });
   }, [role]);
 
+  const loadMore = async () => {
+    try {
+      const res = await api.get(listRoute, { params: { ...listParams, cursor: nextCursor } });
+      setCertificates(prev => [...prev, ...(res.data.certificates || [])]);
+      setNextCursor(res.data.next_cursor);
+    } catch (err) {
+      setMessage('❌ Failed to load more certificates.');
+    }
+  };
+
   const handleUpdate = async (id, newStatus) => {
     try {
       
@@ -85,28 +121,27 @@ const handleDownload = async (fileUrl, title) => {
   }
 };
 
-  const exportToExcel = (dataToExport, fileName) => {
-    const worksheet = XLSX.utils.json_to_sheet(
-      dataToExport.map(({ title, client, technologies, start_date, end_date, status }) => ({
-        Title: title,
-        Client: client,
-        Technologies: technologies || '—',
-        'Start Date': start_date ? new Date(start_date).toLocaleDateString() : '—',
-        'End Date': end_date ? new Date(end_date).toLocaleDateString() : '—',
-        Status: status,
-      }))
-    );
-    const workbook = XLSX.utils.book_new();
-    XLSX.utils.book_append_sheet(workbook, worksheet, 'Certificates');
-    XLSX.writeFile(workbook, `${fileName}.xlsx`);
+  // The server streams every matching certificate, not just the pages loaded here
+  const exportToExcel = async (fileName) => {
+    try {
+      const res = await api.get('/certificates/export', {
+        params: { format: 'xlsx', ...statusParams },
+        responseType: 'blob',
+      });
+      const url = window.URL.createObjectURL(res.data);
+      const link = document.createElement('a');
+      link.href = url;
+      link.setAttribute('download', `${fileName}.xlsx`);
+      document.body.appendChild(link);
+      link.click();
+      link.remove();
+      window.URL.revokeObjectURL(url);
+    } catch (err) {
+      setMessage('❌ Export failed.');
+    }
   };
 
-  const filteredCertificates = certificates
-    .filter(cert =>
-      (filterStatus === 'all' || cert.status === filterStatus) &&
-      (cert.title?.toLowerCase().includes(searchTerm.toLowerCase()) ||
-        cert.client?.toLowerCase().includes(searchTerm.toLowerCase()))
-    )
+  const filteredCertificates = [...certificates]
     .sort((a, b) => {
       if (sortBy === 'title') return a.title.localeCompare(b.title);
       if (sortBy === 'client') return a.client.localeCompare(b.client);
@@ -132,7 +167,7 @@ const handleDownload = async (fileUrl, title) => {
           <label className="form-label fw-bold">Search</label>
           <input
             type="text"
-            placeholder="Title or Client..."
+            placeholder="Title, client, technology, contact..."
             className="form-control"
             value={searchTerm}
             onChange={(e) => setSearchTerm(e.target.value)}
@@ -168,9 +203,7 @@ const handleDownload = async (fileUrl, title) => {
         <div className="col-md-9 d-flex align-items-end justify-content-end">
           <button
             className="btn btn-success shadow-sm"
-            onClick={() =>
-              exportToExcel(filteredCertificates, "CertFlow_Report")
-            }
+            onClick={() => exportToExcel("CertFlow_Report")}
           >
             <i className="bi bi-file-earmark-spreadsheet"></i> Export Filtered
             to Excel
@@ -182,6 +215,14 @@ const handleDownload = async (fileUrl, title) => {
         <div className="alert alert-info text-center fw-bold">{message}</div>
       )}
 
+      {expiring && (expiring.certificates.length > 0 || expiring.tcil.length > 0) && (
+        <div className="alert alert-warning">
+          <strong>Expiring within {expiring.days} days:</strong>{' '}
+          {[...expiring.tcil.map(c => `${c.name} (TCIL, ${c.days_left}d)`),
+            ...expiring.certificates.map(c => `${c.title} (${c.days_left}d)`)].join(', ')}
+        </div>
+      )}
+
       <div className="table-responsive bg-white rounded shadow-sm">
         {loading ? (
           <div className="text-center p-5">
@@ -282,6 +323,14 @@ const handleDownload = async (fileUrl, title) => {
           </table>
         )}
       </div>
+
+      {!loading && nextCursor && (
+        <div className="text-center mt-3">
+          <button className="btn btn-outline-primary" onClick={loadMore}>
+            Load More
+          </button>
+        </div>
+      )}
     </div>
   );
 }
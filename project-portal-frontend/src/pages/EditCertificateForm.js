@@ -18,9 +18,8 @@ function EditCertificateForm() {
   });
 
   useEffect(() => {
-    api.get(`/certificates/all`).then((res) => {
-      const cert = res.data.find(c => c.id === parseInt(id));
-      if (cert) setForm({ ...cert, file: null });
+    api.get(`/certificates/${id}`).then((res) => {
+      if (res.data) setForm({ ...res.data, file: null });
     }).catch(() => setError('Failed to load data.'));
   }, [id]);
 
@@ -5,6 +5,7 @@ function TCILCertificates() {
   const [certificates, setCertificates] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState("");
+  const [nextCursor, setNextCursor] = useState(null);
 
   const currentUserId = localStorage.getItem("userId");
   const userRole = localStorage.getItem("userRole");
@@ -13,6 +14,7 @@ function TCILCertificates() {
     try {
       const res = await api.get("/tcil/certificates");
       setCertificates(res.data.certificates || []);
+      setNextCursor(res.data.next_cursor);
     } catch (err) {
       setError("❌ Failed to load the TCIL repository.");
     } finally {
@@ -20,6 +22,16 @@ function TCILCertificates() {
     }
   };
 
+  const loadMore = async () => {
+    try {
+      const res = await api.get("/tcil/certificates", { params: { cursor: nextCursor } });
+      setCertificates((prev) => [...prev, ...(res.data.certificates || [])]);
+      setNextCursor(res.data.next_cursor);
+    } catch (err) {
+      setError("❌ Failed to load more certificates.");
+    }
+  };
+
   useEffect(() => {
     fetchCertificates();
   }, []);
@@ -152,6 +164,14 @@ function TCILCertificates() {
           </tbody>
         </table>
       </div>
+
+      {nextCursor && (
+        <div className="text-center mt-3">
+          <button className="btn btn-outline-primary" onClick={loadMore}>
+            Load More
+          </button>
+        </div>
+      )}
     </div>
   );
 }
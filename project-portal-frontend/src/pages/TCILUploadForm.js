@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import api from '../api/axios';
+import { directUpload } from '../api/directUpload';
 import { useNavigate } from 'react-router-dom';
 
 function TCILUploadForm() {
@@ -29,19 +29,12 @@ function TCILUploadForm() {
     }
 
     setLoading(true);
-    
-    // Create FormData for Multipart/Form-Data transmission
-    const data = new FormData();
-    data.append('name', name);
-    data.append('valid_from', validFrom);
-    data.append('valid_till', validTill);
-    data.append('pdf', file); 
 
     try {
-      // Axios interceptor handles the JWT automatically
-      const response = await api.post('/tcil/upload', data);
-      
-      setMessage(`✅ ${response.data.msg || 'TCIL Certificate uploaded successfully!'}`);
+      // File goes straight to storage; only metadata passes through the API
+      await directUpload(file, 'tcil', { name, valid_from: validFrom, valid_till: validTill });
+
+      setMessage('✅ TCIL Certificate uploaded successfully!');
       
       // Clear form on success
       setName('');
@@ -50,7 +43,7 @@ function TCILUploadForm() {
       // Redirect to Dashboard after a short delay
       setTimeout(() => navigate('/dashboard'), 2000);
     } catch (err) {
-      const serverMsg = err.response?.data?.msg || 'Upload failed. Check file size or permissions.';
+      const serverMsg = err.response?.data?.message || err.response?.data?.msg || 'Upload failed. Check file size or permissions.';
       setError(`❌ ${serverMsg}`);
     } finally {
       setLoading(false);
@@ -1,5 +1,5 @@
 import React, { useState } from 'react';
-import api from '../api/axios';
+import { directUpload } from '../api/directUpload';
 import { useNavigate } from 'react-router-dom';
 
 function UploadPage() {
@@ -42,13 +42,7 @@ function UploadPage() {
     setMessage('⏳ Uploading to cloud storage...');
 
     try {
-      const data = new FormData();
-      Object.entries(formData).forEach(([key, value]) => {
-        data.append(key, value || ''); // Ensure no nulls are sent
-      });
-      data.append('file', selectedFile);
-
-      await api.post('/certificates', data);
+      await directUpload(selectedFile, 'certificate', formData);
 
       setMessage('✅ Success! Project submitted for approval.');
       setTimeout(() => navigate('/dashboard'), 2000);